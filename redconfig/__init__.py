@@ -1,5 +1,8 @@
 """ Recursive Config Manager """
 
 from .configmanager import ConfigManager1, ConfigManager, SQLDriver, RedisDriver
+from .configmanager import PlaceholderCycleError
+from .aconfigmanager import AsyncConfigManager
+from .metrics import Metrics, MetricsHook
 from .driver import dredis, dsql, idriver
 from . import helpers
@@ -0,0 +1,441 @@
+""" Кэш слоёв с деревом ключей по сегментам ':' """
+import fnmatch
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# символы маски fnmatch
+_WILDCARDS = re.compile(r"[*?\[]")
+# политики вытеснения BoundedCache
+POLICIES = ("lru", "lfu")
+_ABSENT = object()
+
+
+class _Node:
+    """Сегмент ключа в дереве"""
+
+    __slots__ = ("children", "key")
+
+    def __init__(self):
+        self.children = {}
+        # полный ключ, если он есть в кэше
+        self.key = None
+
+
+class LayerCache(dict):
+    """
+    Словарь слоёв 'rc:<path>' -> значение, который ведёт дерево ключей по сегментам ':'
+    Чтение - обычный dict, изменения обновляют дерево, поиск по маске
+    обходит только ветку до первого сегмента с маской
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if not dict.__contains__(self, key):
+                self._insert(key)
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self._remove(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, key, *default):
+        with self._lock:
+            if dict.__contains__(self, key):
+                self._remove(key)
+            return super().pop(key, *default)
+
+    def popitem(self):
+        with self._lock:
+            key, value = super().popitem()
+            self._remove(key)
+            return key, value
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                self[key] = default
+            return self[key]
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._root = _Node()
+
+    def copy(self) -> "LayerCache":
+        with self._lock:
+            return type(self)(self)
+
+    def match(self, pattern: str, subtree: bool = False) -> list:
+        """
+        Ключи кэша по маске fnmatch, маска должна совпасть с ключом целиком
+        :param pattern: маска, например 'rc:app:*'
+        :param subtree: вместе со всеми ключами под совпавшими
+        """
+        with self._lock:
+            segments = pattern.split(":")
+            node = self._root
+            prefix = []
+            for segment in segments:
+                if _WILDCARDS.search(segment):
+                    break
+                if (node := node.children.get(segment)) is None:
+                    return []
+                prefix.append(segment)
+            else:
+                # маски нет, нужен сам ключ и, возможно, ветка под ним
+                if subtree:
+                    return list(self._walk(node))
+                return [node.key] if node.key is not None else []
+            res = []
+            stack = [(node, ":".join(prefix))]
+            while stack:
+                node, path = stack.pop()
+                for segment, child in node.children.items():
+                    _path = f"{path}:{segment}" if path else segment
+                    if not fnmatch.fnmatchcase(_path, pattern):
+                        stack.append((child, _path))
+                    elif subtree:
+                        res.extend(self._walk(child))
+                    elif child.key is not None:
+                        res.append(child.key)
+                        stack.append((child, _path))
+                    else:
+                        stack.append((child, _path))
+            return res
+
+    @staticmethod
+    def _walk(node: _Node):
+        """Все ключи ветки"""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.key is not None:
+                yield node.key
+            stack.extend(node.children.values())
+
+    def _insert(self, key: str):
+        node = self._root
+        for segment in key.split(":"):
+            if (child := node.children.get(segment)) is None:
+                child = node.children[segment] = _Node()
+            node = child
+        node.key = key
+
+    def _remove(self, key: str):
+        segments = key.split(":")
+        nodes = [self._root]
+        for segment in segments:
+            if (node := nodes[-1].children.get(segment)) is None:
+                return
+            nodes.append(node)
+        nodes[-1].key = None
+        # пустые ветки убираются снизу вверх
+        for i in range(len(segments) - 1, -1, -1):
+            node = nodes[i + 1]
+            if node.key is not None or node.children:
+                break
+            del nodes[i].children[segments[i]]
+
+    def pin(self, keys):
+        """
+        Закрепляет слои, чтобы они не вытеснялись
+        В неограниченном кэше слои не вытесняются, вызов ничего не делает
+        :param keys: ключи кэша
+        """
+
+    def unpin(self, pattern: str = "*"):
+        """
+        Снимает закрепление
+        :param pattern: маска ключей
+        """
+
+    def stats(self) -> dict:
+        """
+        Размер кэша и число вытесненных слоёв
+        """
+        return dict(entries=len(self), evictions=0, expirations=0)
+
+
+class BoundedCache(LayerCache):
+    """
+    Кэш слоёв с ограничением по числу слоёв или по памяти и временем жизни слоя
+    Чтение идёт под блокировкой, потому что отмечает использование слоя.
+    Вытесняется давно не читавшийся (lru) или реже всех читавшийся (lfu) слой,
+    закреплённые слои не вытесняются, но время жизни у них истекает.
+    Только что записанный слой не вытесняется, даже если он один больше max_bytes
+    """
+
+    def __init__(
+        self,
+        data: dict = None,
+        max_entries: int = None,
+        max_bytes: int = None,
+        policy: str = "lru",
+        ttl: float = None,
+        on_evict=None,
+    ):
+        """
+        :param data: начальные слои
+        :param max_entries: максимальное число слоёв
+        :param max_bytes: максимальный размер ключей и текстов слоёв в памяти
+        :param policy: 'lru' или 'lfu'
+        :param ttl: сколько секунд слой живёт в кэше, None - не ограничено
+        :param on_evict: on_evict(key, reason) после удаления слоя,
+            reason - 'evicted' или 'expired', вызывается без блокировки кэша
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.ttl = ttl
+        self.on_evict = on_evict
+        # число чтений -> ключи по порядку последнего чтения, в lru число всегда 1
+        self._buckets = {}
+        self._counts = {}
+        self._least = 1
+        self._sizes = {}
+        self._bytes = 0
+        # ключ -> время истечения
+        self._expires = {}
+        self._pinned = set()
+        self.evictions = 0
+        self.expirations = 0
+        super().__init__(data or {})
+
+    def get(self, key, default=None):
+        with self._lock:
+            if not dict.__contains__(self, key):
+                return default
+            if not self._expired(key):
+                self._touch(key)
+                return dict.__getitem__(self, key)
+        self._notify([key], "expired")
+        return default
+
+    def __getitem__(self, key):
+        if (value := self.get(key, _ABSENT)) is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            if not dict.__contains__(self, key):
+                return False
+            if not self._expired(key):
+                return True
+        self._notify([key], "expired")
+        return False
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def put(self, key: str, value, ttl: float = None):
+        """
+        Записывает слой
+        :param key: ключ кэша
+        :param value: слой
+        :param ttl: время жизни этого слоя, None - общее ttl кэша, 0 - не ограничено
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            super().__setitem__(key, value)
+            size = _sizeof(key, value)
+            self._bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            if ttl:
+                self._expires[key] = time.monotonic() + ttl
+            else:
+                self._expires.pop(key, None)
+            if key in self._counts:
+                self._touch(key)
+            elif key not in self._pinned:
+                self._add(key)
+            evicted = self._shrink(key)
+        self._notify(evicted, "evicted")
+
+    def update(self, *args, **kwargs):
+        # вытесненные слои передаются в on_evict после каждой записи, без блокировки
+        for key, value in dict(*args, **kwargs).items():
+            self.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._buckets.clear()
+            self._counts.clear()
+            self._least = 1
+            self._sizes.clear()
+            self._bytes = 0
+            self._expires.clear()
+            self._pinned.clear()
+
+    def copy(self) -> "BoundedCache":
+        with self._lock:
+            cache = type(self)(
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                policy=self.policy,
+                ttl=self.ttl,
+                on_evict=self.on_evict,
+            )
+            cache._pinned = set(self._pinned)
+            # порядок вытеснения сохраняется, закреплённые слои идут первыми
+            keys = [key for key in self if key in self._pinned]
+            for count in sorted(self._buckets):
+                keys.extend(self._buckets[count])
+            for key in keys:
+                LayerCache.__setitem__(cache, key, dict.__getitem__(self, key))
+                if key in self._counts:
+                    cache._add(key, self._counts[key])
+            cache._sizes = dict(self._sizes)
+            cache._bytes = self._bytes
+            cache._expires = dict(self._expires)
+            cache.evictions = self.evictions
+            cache.expirations = self.expirations
+            return cache
+
+    def expire(self, keys) -> bool:
+        """
+        Удаляет слои с истёкшим временем жизни
+        :param keys: ключи кэша
+        :return: истёк ли хотя бы один слой
+        """
+        if not self._expires:
+            return False
+        with self._lock:
+            expired = [key for key in keys if self._expired(key)]
+        self._notify(expired, "expired")
+        return bool(expired)
+
+    def pin(self, keys):
+        with self._lock:
+            for key in keys:
+                if key in self._pinned:
+                    continue
+                self._pinned.add(key)
+                if key in self._counts:
+                    self._discard(key)
+
+    def unpin(self, pattern: str = "*"):
+        with self._lock:
+            for key in fnmatch.filter(self._pinned, pattern):
+                self._pinned.discard(key)
+                if dict.__contains__(self, key):
+                    self._add(key)
+            evicted = self._shrink(None)
+        self._notify(evicted, "evicted")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                entries=len(self),
+                bytes=self._bytes,
+                pinned=sum(1 for key in self._pinned if dict.__contains__(self, key)),
+                evictions=self.evictions,
+                expirations=self.expirations,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                policy=self.policy,
+                ttl=self.ttl,
+            )
+
+    def _remove(self, key: str):
+        super()._remove(key)
+        self._bytes -= self._sizes.pop(key, 0)
+        self._expires.pop(key, None)
+        if key in self._counts:
+            self._discard(key)
+
+    def _expired(self, key: str) -> bool:
+        """Удаляет слой с истёкшим временем жизни, вызывается под блокировкой"""
+        if (expire := self._expires.get(key)) is None or expire > time.monotonic():
+            return False
+        dict.__delitem__(self, key)
+        self._remove(key)
+        self.expirations += 1
+        return True
+
+    def _add(self, key: str, count: int = 1):
+        self._counts[key] = count
+        self._buckets.setdefault(count, OrderedDict())[key] = None
+        self._least = min(self._least, count) if len(self._counts) > 1 else count
+
+    def _touch(self, key: str):
+        if (count := self._counts.get(key)) is None:
+            # закреплённый слой
+            return
+        if self.policy == "lru":
+            self._buckets[count].move_to_end(key)
+            return
+        self._discard(key)
+        self._add(key, count + 1)
+
+    def _discard(self, key: str):
+        count = self._counts.pop(key)
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if count == self._least and self._buckets:
+                self._least = min(self._buckets)
+
+    def _shrink(self, keep: str or None) -> list:
+        """
+        Вытесняет слои, пока кэш больше ограничений, вызывается под блокировкой
+        :param keep: только что записанный слой
+        :return: вытесненные ключи
+        """
+        evicted = []
+        while (self.max_entries is not None and len(self) > self.max_entries) or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            if (key := self._victim(keep)) is None:
+                break
+            dict.__delitem__(self, key)
+            self._remove(key)
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _victim(self, keep: str or None) -> str or None:
+        if (bucket := self._buckets.get(self._least)) is not None:
+            for key in bucket:
+                if key != keep:
+                    return key
+        for count in sorted(self._buckets):
+            for key in self._buckets[count]:
+                if key != keep:
+                    return key
+        return None
+
+    def _notify(self, keys: list, reason: str):
+        if self.on_evict is None:
+            return
+        for key in keys:
+            self.on_evict(key, reason)
+
+
+def _sizeof(key: str, value) -> int:
+    """Память ключа и текста слоя, значение - текст или (текст, атрибуты)"""
+    text = value[0] if isinstance(value, tuple) else value
+    return sys.getsizeof(key) + (sys.getsizeof(text) if text is not None else 0)
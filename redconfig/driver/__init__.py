@@ -1,6 +1,9 @@
 """ Drivers modules """
 from .dfile import FileSystemDriver
 from .dhazel import HazelcastDriver
+from .dmemory import MemoryDriver
 from .dredis import RedisDriver
+from .dshm import SharedMemoryDriver
 from .dsql import SQLDriver
-from .idriver import IDriver
+from .idriver import IDriver, HistoryLostError
+from .iadriver import IAsyncDriver, ThreadDriver
@@ -0,0 +1,117 @@
+""" Async SQL Driver"""
+
+from .dsql import SQLStatements, match
+from .iadriver import IAsyncDriver
+
+
+class AsyncSQLDriver(SQLStatements, IAsyncDriver):
+    """ Async SQL Driver"""
+
+    def __init__(self, connection_string: str, *,
+                 connect_args: str = None,
+                 table_name: str = 'redconfig',
+                 schema: str = 'configmap',
+                 **kwargs):
+        # sqlalchemy.ext.asyncio требует greenlet, синхронным пользователям он не нужен
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        if connection_string.startswith('postgresql://'):
+            # драйвер по умолчанию psycopg2 не умеет asyncio
+            connection_string = 'postgresql+psycopg://' + connection_string[len('postgresql://'):]
+        self.engine = create_async_engine(
+            connection_string,
+            connect_args=connect_args or {},
+        )
+        self._init_statements(table_name, **kwargs)
+        self._ready = False
+
+    async def _connect(self):
+        """ Соединение, при первом обращении создаёт таблицу """
+        if not self._ready:
+            async with self.engine.begin() as conn:
+                await conn.run_sync(self._create_table)
+            self._ready = True
+        return self.engine.connect()
+
+    async def set(self, path: str, value: str) -> bool:
+        async with await self._connect() as conn:
+            res = await conn.execute(self.upsert_stmt, dict(path=path, value=value))
+            await conn.commit()
+        return bool(res.rowcount)
+
+    async def set_many(self, path_value: dict) -> int:
+        """ Upsert many values with multi-row INSERT ... ON CONFLICT, returns affected rows """
+        if not path_value:
+            return 0
+        rows = [dict(key=path, value=value) for path, value in path_value.items()]
+        count = 0
+        async with await self._connect() as conn:
+            for chunk in self._chunks(rows):
+                count += (await conn.execute(self.bulk_upsert_stmt.values(chunk))).rowcount
+            await conn.commit()
+        return count
+
+    async def get(self, path: str) -> str:
+        kind, params = match(path)
+        async with await self._connect() as conn:
+            return await conn.scalar(self.select_value_stmt[kind], params)
+
+    async def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ key = ANY(:keys), с suffix - одним запросом по всем маскам key + suffix """
+        if not keys:
+            return {}
+        res = {}
+        async with await self._connect() as conn:
+            for stmt in self._select_batch(keys, suffix):
+                res.update((row.key, row.value) for row in await conn.execute(stmt))
+        return res
+
+    async def get_many(self, path: str, not_path: str = '') -> dict or None:
+        stmt, params = self._select_many(path, not_path)
+        async with await self._connect() as conn:
+            res = (await conn.execute(stmt, params)).all()
+        if not res:
+            return None
+        return {row.key: row.value for row in res}
+
+    async def keys(self, path: str) -> list:
+        kind, params = match(path)
+        async with await self._connect() as conn:
+            return list(await conn.scalars(self.select_key_stmt[kind], params))
+
+    async def delete(self, path: str) -> list:
+        kind, params = match(path)
+        async with await self._connect() as conn:
+            rows = (await conn.execute(self.delete_stmt[kind], params)).all()
+            await conn.commit()
+        return [row.key for row in rows]
+
+    async def delete_many(self, paths: list) -> list:
+        """ Delete many Keys: exact keys by key = ANY(:keys), masks by OR-ed conditions """
+        if not paths:
+            return []
+        result = []
+        async with await self._connect() as conn:
+            for stmt in self._delete_batch(paths):
+                result.extend(await conn.scalars(stmt))
+            await conn.commit()
+        return result
+
+    async def changes(self, path: str, since=None) -> (dict, int):
+        """ Ключи, изменённые после номера since, см. SQLDriver.changes """
+        connection = await self._connect()
+        if self.journal is None:
+            return await super().changes(path, since)
+        async with connection as conn:
+            marker = await conn.scalar(self.marker_stmt)
+            if since is None:
+                stmt, params = self._select_many(path)
+            else:
+                stmt, params = self._select_changes(path, since)
+            res = {row.key: row.value for row in await conn.execute(stmt, params)}
+            if since is not None:
+                self._check_floor(since, await conn.scalar(self.floor_stmt))
+        return res, marker
+
+    async def close(self):
+        await self.engine.dispose()
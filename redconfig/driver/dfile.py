@@ -1,10 +1,31 @@
 """ Hazelcast Driver """
+import fnmatch
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from . import inotify
 from .idriver import IDriver
 
+# символы маски, с которых начинается перебор ключей
+_WILDCARDS = re.compile(r"[*?\[]")
+
+
+class _Dir:
+    """Каталог ключа в индексе"""
+
+    __slots__ = ("mtime", "files", "dirs")
+
+    def __init__(self, mtime: int, files: tuple, dirs: tuple):
+        # st_mtime_ns каталога на момент обхода
+        self.mtime = mtime
+        # ((имя, mtime_ns, размер), ...) yaml-файлов по имени
+        self.files = files
+        # имена подкаталогов по порядку
+        self.dirs = dirs
+
 
 class FileSystemDriver(IDriver):
     """Redis Driver"""
@@ -13,12 +34,32 @@ class FileSystemDriver(IDriver):
         """
         Создаёт объект для доступа к данным
         :param connection_string: 'file://configmap'
+        :param inotify: следить за каталогами через inotify, если он есть,
+            иначе изменения ищутся по mtime каталогов и файлов при каждом чтении
+        :param read_workers: сколько файлов читать одновременно, 1 - по очереди
         """
         if connection_string and connection_string.startswith("file://"):
             self.root_path = Path(parse_connection(connection_string)).absolute()
         else:
             raise ValueError('connection_string must starts with "file://"')
         self.exclude = set(kwargs.get("exclude") or [])
+        self.read_workers = max(int(kwargs.get("read_workers", 8)), 1)
+        self._pool = None
+        self._lock = threading.RLock()
+        # ключ каталога -> _Dir, корень - пустой ключ
+        self._index = {}
+        # каталоги, которые нужно перечитать при следующем обращении
+        self._stale = set()
+        # путь файла -> ((mtime_ns, размер), текст)
+        self._contents = {}
+        self._watcher = None
+        # номер наблюдения inotify -> ключ каталога
+        self._watches = {}
+        if kwargs.get("inotify", True) and inotify.available():
+            try:
+                self._watcher = inotify.Inotify()
+            except OSError:
+                self._watcher = None
 
     def set(self, path: str, value: str) -> bool:
         try:
@@ -28,6 +69,7 @@ class FileSystemDriver(IDriver):
             if not _path.exists():
                 _path.mkdir(parents=True, exist_ok=True)
             file.write_text(value)
+            self._forget(self._key(path))
             return True
         except Exception as err:
             print(err)
@@ -40,61 +82,50 @@ class FileSystemDriver(IDriver):
 
     def get(self, path: str) -> str | None:
         try:
-            _path = self.get_abs_path(path)
-            values = []
-            for file in _path.glob("*.yaml"):
-                if file.stem in self.exclude:
-                    continue
-                values.append(file.read_text())
-            return "\n".join(values) if values else None
+            key = self._key(path)
+            entry = self._sync(key, depth=0).get(key)
+            return self._value(key, entry) if entry else None
         except Exception as err:
             print(err)
             return None
 
+    def get_batch(self, keys: list, suffix: str = "") -> dict:
+        """Читает каталоги ключей напрямую, без обхода дерева"""
+        res = {}
+        for key in keys:
+            if (value := self.get(key)) is not None:
+                res[key] = value
+        return res
+
     def get_many(self, path: str, not_path: str = "") -> dict or None:
+        """
+        Значения ключей по маске и всех вложенных ключей
+        Читаются только файлы, которые изменились с прошлого чтения
+        """
         res = {}
         try:
-            abs_path = self.get_abs_path(path)
-            if abs_path.is_dir():
-                for key in abs_path.glob("*"):
-                    if key.is_dir():
-                        p = self.to_key_path(key)
-                        m = self.get_many(p)
-                        res.update(m)
-                    if key.is_file():
-                        p = self.to_key_path(key.parent)
-                        value = key.read_text()
-                        res[p] = value
-                return res
-            else:
-                startswith = abs_path.stem
-                abs_path = abs_path.parent
-                for key in abs_path.glob(startswith):
-                    if key.is_dir():
-                        p = self.to_key_path(key)
-                        m = self.get_many(p)
-                        res.update(m)
-                    if key.is_file():
-                        p = self.to_key_path(key.parent)
-                        value = key.read_text()
-                        res[p] = value
-                return res
+            items = self._select(path, not_path)
+            for key, value in zip(items, self._values(items.items())):
+                if value is not None:
+                    res[key] = value
+            return res
         except Exception as err:
             print(err)
             return None
 
     def keys(self, path: str) -> list:
-        res = []
-        abs_path = self.get_abs_path(path)
-        if abs_path.is_dir():
-            res.append(self.to_key_path(abs_path))
-        else:
-            startswith = abs_path.stem
-            abs_path = abs_path.parent
-            for key in abs_path.glob(startswith):
-                if key.is_dir():
-                    res.append(self.to_key_path(key))
-        return res
+        key = self._key(path)
+        prefix = _prefix(key)
+        if prefix == key:
+            return [key] if key in self._sync(key, depth=0) else []
+        # маска действует только на последний сегмент, как glob
+        depth = _level(key)
+        tree = self._sync(prefix, depth=depth - _level(prefix))
+        return [
+            _key
+            for _key in sorted(tree)
+            if _level(_key) == depth and fnmatch.fnmatchcase(_key, key)
+        ]
 
     def delete(self, path: str) -> list:
         """Delete Key"""
@@ -119,6 +150,7 @@ class FileSystemDriver(IDriver):
                         os.remove(key)
         except Exception as err:
             print(err)
+        self._forget(_prefix(self._key(path)))
         return res
 
     def delete_many(self, paths: list) -> list:
@@ -128,8 +160,49 @@ class FileSystemDriver(IDriver):
             res.extend(self.delete(path))
         return res
 
+    def changes(self, path: str, since: dict = None) -> (dict, dict):
+        """
+        Ключи, файлы которых изменились, появились или пропали после снимка since
+        Сравниваются только время изменения и размер файлов, читаются изменённые
+        :param path: маска ключей
+        :param since: снимок из предыдущего вызова, None - все ключи
+        :return: {ключ: значение, у удалённых None}, снимок для следующего вызова
+        """
+        stamps = {}
+        items = []
+        for key, entry in self._select(path).items():
+            stamp = self._stamp(entry)
+            if not stamp:
+                continue
+            stamps[key] = stamp
+            if since is None or since.get(key) != stamp:
+                items.append((key, entry))
+        since = since or {}
+        res = dict(zip((key for key, _ in items), self._values(items)))
+        res.update((key, None) for key in since if key not in stamps)
+        return res, stamps
+
+    def stamps(self, path: str) -> dict:
+        """
+        Время изменения и размер файлов каждого ключа по маске
+        :param path: маска ключей
+        :return: {ключ: ((имя файла, mtime_ns, размер), ...)}
+        """
+        res = {}
+        for key, entry in self._select(path).items():
+            if stamp := self._stamp(entry):
+                res[key] = stamp
+        return res
+
     def close(self):
-        return
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        with self._lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+            self._watches.clear()
 
     def get_abs_path(self, path):
         return Path(self.root_path, path.replace(":", "/").replace(".", "/"))
@@ -137,6 +210,233 @@ class FileSystemDriver(IDriver):
     def to_key_path(self, key):
         return ":".join(key.relative_to(self.root_path).parts)
 
+    @staticmethod
+    def _key(path: str) -> str:
+        """Ключ каталога в индексе, точки в пути - тоже вложенные каталоги"""
+        return path.replace(".", ":")
+
+    def _dir_path(self, key: str) -> str:
+        if not key:
+            return str(self.root_path)
+        return os.path.join(self.root_path, *key.split(":"))
+
+    def _select(self, path: str, not_path: str = "") -> dict:
+        """
+        Каталоги по маске вместе с вложенными
+        :return: {ключ: _Dir} по порядку ключей
+        """
+        key = self._key(path)
+        tree = self._sync(_prefix(key))
+        return {
+            _key: entry
+            for _key, entry in sorted(tree.items())
+            if (
+                _key == key
+                or _key.startswith(key + ":")
+                or fnmatch.fnmatchcase(_key, key)
+            )
+            and not (not_path and fnmatch.fnmatchcase(_key, not_path))
+        }
+
+    def _stamp(self, entry: _Dir) -> tuple:
+        return tuple(f for f in entry.files if f[0][:-5] not in self.exclude)
+
+    def _values(self, items) -> list:
+        """
+        Значения каталогов по порядку items
+        Файлы, которых нет в кеше, сначала читаются параллельно
+        :param items: [(ключ, _Dir), ...]
+        """
+        items = list(items)
+        pending = [item for item in items if not self._cached(*item)]
+        if self.read_workers > 1 and len(pending) > 1:
+            if self._pool is None:
+                with self._lock:
+                    if self._pool is None:
+                        self._pool = ThreadPoolExecutor(
+                            self.read_workers, thread_name_prefix="redconfig-read"
+                        )
+            # результат не нужен, файлы остаются в кеше содержимого
+            for _ in self._pool.map(lambda item: self._value(*item), pending):
+                pass
+        return [self._value(key, entry) for key, entry in items]
+
+    def _cached(self, key: str, entry: _Dir) -> bool:
+        path = self._dir_path(key)
+        for name, mtime, size in entry.files:
+            if name[:-5] in self.exclude:
+                continue
+            cached = self._contents.get(os.path.join(path, name))
+            if cached is None or cached[0] != (mtime, size):
+                return False
+        return True
+
+    def _value(self, key: str, entry: _Dir) -> str | None:
+        """Содержимое yaml-файлов каталога по порядку имён"""
+        path = self._dir_path(key)
+        values = []
+        for name, mtime, size in entry.files:
+            if name[:-5] in self.exclude:
+                continue
+            values.append(self._read(os.path.join(path, name), (mtime, size)))
+        return "\n".join(values) if values else None
+
+    def _read(self, file: str, stamp: tuple) -> str:
+        """Текст файла, с диска читается, только если изменились mtime или размер"""
+        cached = self._contents.get(file)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(file) as f:
+            text = f.read()
+        self._contents[file] = (stamp, text)
+        return text
+
+    def _sync(self, key: str, depth: int = None) -> dict:
+        """
+        Обновляет индекс поддерева, перечитываются только изменившиеся каталоги
+        :param key: корень поддерева
+        :param depth: глубина обхода, None - всё поддерево
+        :return: {ключ: _Dir} существующих каталогов поддерева
+        """
+        with self._lock:
+            if self._watcher is not None:
+                self._drain()
+            res = {}
+            stack = [(key, 0)]
+            while stack:
+                _key, level = stack.pop()
+                entry = self._index.get(_key)
+                if _key in self._stale:
+                    entry = None
+                elif entry is not None and self._watcher is None:
+                    entry = self._poll(_key, entry)
+                if entry is None:
+                    entry = self._scan(_key)
+                    if entry is None:
+                        continue
+                res[_key] = entry
+                if depth is None or level < depth:
+                    for name in entry.dirs:
+                        stack.append((f"{_key}:{name}" if _key else name, level + 1))
+            if depth is None:
+                self._prune(key, res)
+            return res
+
+    def _scan(self, key: str) -> _Dir | None:
+        """Читает каталог одним проходом scandir"""
+        path = self._dir_path(key)
+        self._stale.discard(key)
+        old = self._index.get(key)
+        files, dirs = [], []
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if self._watcher is not None:
+                self._watch(key, path)
+            with os.scandir(path) as entries:
+                for item in entries:
+                    # скрытые каталоги, например ..data в configmap, не ключи
+                    if item.name.startswith("."):
+                        continue
+                    try:
+                        if item.is_dir():
+                            dirs.append(item.name)
+                        elif item.name.endswith(".yaml") and item.is_file():
+                            stat = item.stat()
+                            files.append((item.name, stat.st_mtime_ns, stat.st_size))
+                    except FileNotFoundError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            if old is not None:
+                self._drop_contents(key, self._index.pop(key))
+            return None
+        entry = _Dir(mtime, tuple(sorted(files)), tuple(sorted(dirs)))
+        if old is not None:
+            names = {f[0] for f in entry.files}
+            for name, *_ in old.files:
+                if name not in names:
+                    self._contents.pop(os.path.join(path, name), None)
+        self._index[key] = entry
+        return entry
+
+    def _poll(self, key: str, entry: _Dir) -> _Dir | None:
+        """
+        Проверяет каталог без inotify
+        :return: актуальная запись или None, если каталог нужно перечитать
+        """
+        path = self._dir_path(key)
+        try:
+            # список файлов меняет mtime каталога, содержимое - только mtime файла
+            if os.stat(path).st_mtime_ns != entry.mtime:
+                return None
+            files = []
+            for name, *_ in entry.files:
+                stat = os.stat(os.path.join(path, name))
+                files.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            return None
+        files = tuple(files)
+        if files != entry.files:
+            entry = self._index[key] = _Dir(entry.mtime, files, entry.dirs)
+        return entry
+
+    def _watch(self, key: str, path: str):
+        try:
+            self._watches[self._watcher.add(path)] = key
+        except OSError:
+            # лимит наблюдений исчерпан, дальше только mtime
+            self._watcher.close()
+            self._watcher = None
+            self._watches.clear()
+
+    def _drain(self):
+        """Разбирает события inotify, изменившиеся каталоги перечитаются"""
+        for wd, mask in self._watcher.read():
+            if wd == -1:
+                # очередь переполнилась, события потеряны
+                self._stale.update(self._index)
+                continue
+            key = self._watches.get(wd)
+            if key is None:
+                continue
+            self._stale.add(key)
+            if mask & inotify.IN_IGNORED:
+                self._watches.pop(wd, None)
+
+    def _prune(self, key: str, alive: dict):
+        """Убирает из индекса пропавшие каталоги поддерева"""
+        for _key in list(self._index):
+            if _key in alive:
+                continue
+            if not key or _key == key or _key.startswith(key + ":"):
+                self._stale.discard(_key)
+                self._drop_contents(_key, self._index.pop(_key))
+
+    def _drop_contents(self, key: str, entry: _Dir):
+        path = self._dir_path(key)
+        for name, *_ in entry.files:
+            self._contents.pop(os.path.join(path, name), None)
+
+    def _forget(self, key: str):
+        """Каталог ключа и его родители будут перечитаны при следующем обращении"""
+        with self._lock:
+            while True:
+                self._stale.add(key)
+                if not key:
+                    break
+                key = key.rpartition(":")[0]
+
+
+def _prefix(key: str) -> str:
+    """Ключ до первого сегмента с маской"""
+    if match := _WILDCARDS.search(key):
+        return key[: match.start()].rpartition(":")[0]
+    return key
+
+
+def _level(key: str) -> int:
+    """Глубина ключа, у корня 0"""
+    return key.count(":") + 1 if key else 0
+
 
 def parse_connection(connection_string):
     """Parse connection string"""
@@ -0,0 +1,220 @@
+""" Memory Driver """
+import bisect
+import fnmatch
+import itertools
+import re
+import threading
+
+from .idriver import IDriver, HistoryLostError
+
+# символы маски, с которых начинается перебор ключей
+WILDCARDS = re.compile(r'[*?\[\\]')
+
+# именованные хранилища процесса: все драйверы 'memory://name' видят одни ключи,
+# хранилище освобождается, когда закрыт последний из них
+_spaces = {}
+_spaces_lock = threading.Lock()
+
+
+class MemoryDriver(IDriver):
+    """ Memory Driver """
+
+    def __init__(self, connection_string: str = None, **kwargs):
+        """
+        Создаёт объект для доступа к данным
+        :param connection_string: 'memory://' - своё хранилище, 'memory://name' - общее в процессе
+        :param history: сколько удалённых ключей помнить для changes()
+        """
+        if connection_string is None or not connection_string.startswith('memory://'):
+            raise ValueError('connection_string must starts with "memory://"')
+        self.name = connection_string[len('memory://'):]
+        history = int(kwargs.get('history', 1000))
+        if not self.name:
+            self.space = Space(history)
+            return
+        with _spaces_lock:
+            self.space = _spaces.setdefault(self.name, Space(history))
+            self.space.users += 1
+        self._closed = False
+
+    def set(self, path: str, value: str) -> bool:
+        self.space.put({path: value})
+        return True
+
+    def set_many(self, path_value: dict) -> bool:
+        self.space.put(path_value)
+        return True
+
+    def get(self, path: str) -> str:
+        return self.space.data.get(path)
+
+    def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ Значения по списку ключей, с suffix ключи сначала ищутся по маске """
+        data = self.space.data
+        if suffix:
+            keys = [found for key in keys for found in self.space.scan(key + suffix)]
+        res = {}
+        for key in keys:
+            if (value := data.get(key)) is not None:
+                res[key] = value
+        return res
+
+    def get_many(self, path: str, not_path: str = '') -> dict or None:
+        data = self.space.data
+        res = {}
+        for key in self.space.scan(path):
+            if not_path and fnmatch.fnmatchcase(key, not_path):
+                continue
+            if (value := data.get(key)) is not None:
+                res[key] = value
+        return res
+
+    def keys(self, path: str) -> list:
+        return self.space.scan(path)
+
+    def delete(self, path: str) -> list:
+        """ Delete Key """
+        return self.space.remove(self.space.scan(path))
+
+    def delete_many(self, paths: list) -> list:
+        """ Delete many Keys """
+        keys = dict.fromkeys(key for path in paths for key in self.space.scan(path))
+        return self.space.remove(list(keys))
+
+    def changes(self, path: str, since: int = None) -> (dict, int):
+        """
+        Ключи, изменённые после изменения с номером since
+        :param path: маска ключей
+        :param since: номер из предыдущего вызова, None - все ключи
+        :return: {ключ: значение, у удалённых None}, номер для следующего вызова
+        """
+        space = self.space
+        with space.lock:
+            if since is None:
+                return self.get_many(path), space.seq
+            if since < space.floor:
+                # удаления после since уже забыты
+                raise HistoryLostError(f'memory://{self.name}: '
+                                       f'history before {space.floor} is lost')
+            data = space.data
+            res = {
+                key: data.get(key)
+                for key, seq in itertools.chain(space.changed.items(), space.tombs.items())
+                if seq > since and fnmatch.fnmatchcase(key, path)
+            }
+            return res, space.seq
+
+    def subscribe(self, path: str, callback):
+        """
+        Подписка на изменения ключей, callback(key) вызывается в потоке записи
+        :param path: маска ключей
+        :param callback: callback(key) для каждого изменённого ключа
+        :return: подписка, остановить через stop()
+        """
+        return Subscription(self.space, path, callback)
+
+    def close(self):
+        if not self.name:
+            return
+        with _spaces_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.space.users -= 1
+            if self.space.users == 0 and _spaces.get(self.name) is self.space:
+                del _spaces[self.name]
+
+
+class Space:
+    """ Ключи в словаре и в отсортированном списке для поиска по префиксу
+    Значения читаются без блокировки, список меняется на месте и читается под ней """
+
+    def __init__(self, history: int = 1000):
+        self.data = {}
+        self.index = []
+        self.lock = threading.RLock()
+        # номер последнего изменения и номера изменений ключей для changes():
+        # у ключей в data и у последних history удалённых, более ранние удаления забыты до floor
+        self.seq = 0
+        self.changed = {}
+        self.tombs = {}
+        self.history = history
+        self.floor = 0
+        self.subscriptions = []
+        # открытые драйверы 'memory://name' этого хранилища
+        self.users = 0
+
+    def scan(self, pattern: str) -> list:
+        """ Ключи по маске, перебираются только ключи с тем же префиксом """
+        match = WILDCARDS.search(pattern)
+        if match is None:
+            return [pattern] if pattern in self.data else []
+        prefix = pattern[:match.start()]
+        index = self.index
+        res = []
+        with self.lock:
+            for i in range(bisect.bisect_left(index, prefix), len(index)):
+                key = index[i]
+                if not key.startswith(prefix):
+                    break
+                if fnmatch.fnmatchcase(key, pattern):
+                    res.append(key)
+        return res
+
+    def put(self, path_value: dict):
+        with self.lock:
+            self.seq += 1
+            new = [key for key in path_value if key not in self.data]
+            # значения появляются раньше ключей в индексе
+            self.data.update(path_value)
+            if len(new) == 1:
+                bisect.insort(self.index, new[0])
+            elif new:
+                # новые ключи добавляются в конец, сортировка дособирает уже упорядоченный список
+                self.index.extend(new)
+                self.index.sort()
+            self.changed.update(dict.fromkeys(path_value, self.seq))
+            for key in new:
+                self.tombs.pop(key, None)
+        self.notify(list(path_value))
+
+    def remove(self, keys: list) -> list:
+        with self.lock:
+            keys = [key for key in keys if key in self.data]
+            if not keys:
+                return []
+            self.seq += 1
+            removed = set(keys)
+            self.index[:] = [key for key in self.index if key not in removed]
+            for key in keys:
+                del self.data[key]
+                del self.changed[key]
+                self.tombs[key] = self.seq
+            if len(self.tombs) > self.history:
+                # удалённые ключи лежат в порядке удаления
+                for key in list(itertools.islice(self.tombs, len(self.tombs) - self.history)):
+                    self.floor = self.tombs.pop(key)
+        self.notify(keys)
+        return keys
+
+    def notify(self, keys: list):
+        for subscription in list(self.subscriptions):
+            for key in keys:
+                if fnmatch.fnmatchcase(key, subscription.path):
+                    subscription.callback(key)
+
+
+class Subscription:
+    """ Подписка на изменения Space """
+
+    def __init__(self, space: Space, path: str, callback):
+        self.space = space
+        self.path = path
+        self.callback = callback
+        with space.lock:
+            space.subscriptions.append(self)
+
+    def stop(self):
+        with self.space.lock:
+            if self in self.space.subscriptions:
+                self.space.subscriptions.remove(self)
@@ -1,9 +1,30 @@
 """ Redis Driver """
+import fnmatch
+import itertools
+import logging
+import os
 import re
+import time
 
 import redis
 
-from .idriver import IDriver
+from .idriver import IDriver, HistoryLostError
+
+# журнал изменений: sorted set ключ -> номер записи, номер - следующий после наибольшего,
+# записи старше ARGV[1] номеров удаляются, наибольший удалённый номер хранится в KEYS[2]
+JOURNAL_SCRIPT = """
+local top = redis.call('ZREVRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local floor = tonumber(redis.call('GET', KEYS[2])) or 0
+local seq = math.max(tonumber(top[2]) or 0, floor) + 1
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[1], seq, ARGV[i])
+end
+local horizon = seq - tonumber(ARGV[1])
+if horizon > floor and redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', horizon) > 0 then
+    redis.call('SET', KEYS[2], horizon)
+end
+return seq
+"""
 
 
 class RedisDriver(IDriver):
@@ -24,51 +45,260 @@ class RedisDriver(IDriver):
                                        username=user,
                                        password=password,
                                        decode_responses=True)
+        # сколько ключей просить у SCAN за одну итерацию
+        self.scan_count = int(kwargs.get('scan_count') or 1000)
+        # сколько ключей отправлять в одной команде MGET/UNLINK
+        self.chunk_size = int(kwargs.get('chunk_size') or 500)
+        # канал pub/sub для изменённых ключей, без него подписка идёт на keyspace notifications
+        self.channel = kwargs.get('channel')
+        # sorted set с номерами изменений ключей для changes(), по умолчанию журнал не ведётся:
+        # каждая запись с журналом - ещё один вызов скрипта
+        self.journal = kwargs.get('journal')
+        # сколько последних номеров журнала хранить, changes() с более старым since недоступен
+        self.journal_keep = int(kwargs.get('journal_keep') or 100000)
+        self._journal_script = self.redis.register_script(JOURNAL_SCRIPT)
+        self.db = dbs
 
     def set(self, path: str, value: str) -> bool:
-        return self.redis.set(path, value)
+        res = self.redis.set(path, value)
+        self._journal([path])
+        self._publish([path])
+        return res
 
     def set_many(self, path_value: dict) -> bool:
-        return self.redis.mset(path_value)
+        res = self.redis.mset(path_value)
+        self._journal(list(path_value))
+        self._publish(list(path_value))
+        return res
 
     def get(self, path: str) -> str:
         value = self.redis.get(path)
         return value
 
+    def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ MGET по списку ключей, с suffix ключи сначала ищутся по маске """
+        if suffix:
+            keys = self._scan_many([escape(key) + suffix for key in keys])
+        if not keys:
+            return {}
+        values = self._mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
     def get_many(self, path: str, not_path: str = '') -> dict or None:
-        keys = self.redis.keys(path)
+        keys = self._scan(path)
         if not keys:
             return None
-        values = self.redis.mget(keys)
-        res = dict(zip(keys, values))
+        values = self._mget(keys)
+        res = {key: value for key, value in zip(keys, values) if value is not None}
         return res
 
     def keys(self, path: str) -> list:
-        keys = self.redis.keys(path)
+        keys = self._scan(path)
         return keys
 
     def delete(self, path: str) -> list:
         """ Delete Key """
-        keys = self.redis.keys(path)
+        return self.delete_many([path])
+
+    def delete_many(self, paths: list) -> list:
+        """ Delete many Keys: точные ключи удаляются сразу, маски - за один проход SCAN """
+        keys = [path for path in paths if not is_pattern(path)]
+        keys.extend(self._scan_many([path for path in paths if is_pattern(path)]))
+        keys = list(dict.fromkeys(keys))
         if not keys:
             return []
-        res = []
-        for key in keys:
-            if self.redis.delete(key) == 1:
-                res.append(key)
+        res = self._unlink(keys)
+        self._journal(res)
+        self._publish(res)
         return res
 
-    def delete_many(self, paths: list) -> list:
-        """ Delete many Keys """
+    def changes(self, path: str, since=None) -> (dict, int):
+        """
+        Ключи, изменённые после записи журнала с номером since
+        Видны только изменения, сделанные через драйвер с журналом
+        :param path: маска ключей
+        :param since: номер из предыдущего вызова, None - все ключи
+        :return: {ключ: значение, у удалённых None}, номер для следующего вызова
+        """
+        if not self.journal:
+            return super().changes(path, since)
+        if since is None:
+            # номер берётся до чтения, изменения во время чтения придут ещё раз
+            top = self.redis.zrevrange(self.journal, 0, 0, withscores=True)
+            return self.get_many(path) or {}, int(top[0][1]) if top else 0
+        with self.redis.pipeline() as pipe:
+            pipe.zrangebyscore(self.journal, f'({since}', '+inf', withscores=True)
+            pipe.get(self._floor)
+            entries, floor = pipe.execute()
+        if floor is not None and since < int(floor):
+            # удаления после since уже забыты
+            raise HistoryLostError(f'{self.journal}: history before {floor} is lost')
+        keys = [key for key, seq in entries if fnmatch.fnmatchcase(key, path)]
+        marker = max((int(seq) for key, seq in entries), default=since)
+        return dict(zip(keys, self._mget(keys))), marker
+
+    def subscribe(self, path: str, callback):
+        """
+        Фоновая подписка на изменения ключей
+        Без channel слушает keyspace notifications, на сервере должно быть включено
+        notify-keyspace-events (например 'Kg$x')
+        :param path: маска ключей
+        :param callback: callback(key) для каждого изменённого ключа
+        :return: поток подписки, остановить через stop()
+        """
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        if self.channel:
+            def handler(message):
+                if fnmatch.fnmatchcase(message['data'], path):
+                    callback(message['data'])
+            pubsub.subscribe(**{self.channel: handler})
+        else:
+            def handler(message):
+                callback(message['channel'].split(':', 1)[1])
+            pubsub.psubscribe(**{f'__keyspace@{self.db}__:{path}': handler})
+        return pubsub.run_in_thread(sleep_time=1.0, daemon=True,
+                                    exception_handler=_Backoff())
+
+    def _publish(self, keys: list):
+        """ Сообщает подписчикам об изменённых ключах """
+        if not self.channel or not keys:
+            return
+        with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.publish(self.channel, key)
+            pipe.execute()
+
+    def _journal(self, keys: list):
+        """ Записывает изменённые ключи в журнал одним номером """
+        if not self.journal or not keys:
+            return
+        for chunk in self._chunks(keys):
+            self._journal_script(keys=[self.journal, self._floor],
+                                 args=[self.journal_keep] + chunk)
+
+    @property
+    def _floor(self) -> str:
+        """ Ключ с наибольшим удалённым из журнала номером """
+        return f'{self.journal}:floor'
+
+    def _scan(self, path: str) -> list:
+        """ Ключи по маске без блокирующей команды KEYS """
+        if not is_pattern(path):
+            return [path] if self.redis.exists(path) else []
+        # SCAN может вернуть один ключ дважды
+        return list(dict.fromkeys(self.redis.scan_iter(match=path, count=self.scan_count)))
+
+    def _scan_many(self, patterns: list) -> list:
+        """ Ключи по нескольким маскам за один проход SCAN с общим префиксом масок """
+        if len(patterns) <= 1:
+            return self._scan(patterns[0]) if patterns else []
+        match, matches = scan_match(patterns)
+        return list(dict.fromkeys(
+            key for key in self.redis.scan_iter(match=match, count=self.scan_count)
+            if matches(key)))
+
+    def _chunks(self, keys: list):
+        for i in range(0, len(keys), self.chunk_size):
+            yield keys[i:i + self.chunk_size]
+
+    def _mget(self, keys: list) -> list:
+        """ MGET частями в одном конвейере """
+        with self.redis.pipeline(transaction=False) as pipe:
+            for chunk in self._chunks(keys):
+                pipe.mget(chunk)
+            return list(itertools.chain.from_iterable(pipe.execute()))
+
+    def _unlink(self, keys: list) -> list:
+        """ UNLINK в конвейере, возвращает удалённые ключи """
         res = []
-        for path in paths:
-            res.extend(self.delete(path))
+        with self.redis.pipeline(transaction=False) as pipe:
+            for chunk in self._chunks(keys):
+                for key in chunk:
+                    pipe.unlink(key)
+                res.extend(key for key, count in zip(chunk, pipe.execute()) if count == 1)
         return res
 
     def close(self):
         return self.redis.close()
 
 
+class _Backoff:
+    """ Ошибки потока подписки: при потере соединения пауза перед повтором растёт до limit """
+
+    def __init__(self, limit: float = 30.0):
+        self.limit = limit
+        self.delay = 0.0
+        self.failed = 0.0
+
+    def __call__(self, err, pubsub, thread):
+        if not isinstance(err, redis.ConnectionError):
+            logging.error('redis subscription: %r', err)
+            return
+        # соединение держалось дольше limit - пауза снова с начала
+        if time.monotonic() - self.failed > self.limit:
+            self.delay = 0.0
+        self.delay = min(self.limit, self.delay * 2 or 0.1)
+        logging.warning('redis subscription lost, retry in %.1fs: %r', self.delay, err)
+        time.sleep(self.delay)
+        self.failed = time.monotonic()
+
+
+def is_pattern(path: str) -> bool:
+    """ Есть ли в пути символы маски Redis """
+    return any(char in path for char in '*?[')
+
+
+def escape(path: str) -> str:
+    """ Путь как маска, которая совпадает только с ним самим """
+    return re.sub(r'([*?\[\\])', r'\\\1', path)
+
+
+def scan_match(patterns: list) -> (str, callable):
+    """
+    Одна маска для SCAN MATCH и проверка ключа на совпадение с любой из масок
+    :param patterns: маски Redis
+    :return: общая постоянная часть масок с '*', функция key -> bool
+    """
+    prefix = _literal(os.path.commonprefix([_literal(pattern) for pattern in patterns]))
+    regex = re.compile('|'.join(_translate(pattern) for pattern in patterns), re.S)
+    return prefix + '*', lambda key: regex.fullmatch(key) is not None
+
+
+def _literal(pattern: str) -> str:
+    """ Начало маски до первого символа маски или незавершённого экранирования """
+    i = 0
+    while i < len(pattern) and pattern[i] not in '*?[':
+        if pattern[i] == '\\':
+            if i + 1 == len(pattern):
+                break
+            i += 1
+        i += 1
+    return pattern[:i]
+
+
+def _translate(pattern: str) -> str:
+    """ Маска Redis в регулярное выражение """
+    res = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\' and i + 1 < len(pattern):
+            i += 1
+            res.append(re.escape(pattern[i]))
+        elif char == '*':
+            res.append('.*')
+        elif char == '?':
+            res.append('.')
+        elif char == '[' and (end := pattern.find(']', i + 2)) > 0:
+            body = pattern[i + 1:end]
+            res.append('[' + ('^' + body[1:] if body.startswith('^') else body) + ']')
+            i = end
+        else:
+            res.append(re.escape(char))
+        i += 1
+    return '(?:' + ''.join(res) + ')'
+
+
 def parse_connection(connection_string):
     """ Parse connection string """
     items = re.findall(r'redis://(.*):(.*)@(.+):(.+)/(.+)', connection_string)
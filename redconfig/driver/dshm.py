@@ -0,0 +1,339 @@
+""" Shared Memory Driver """
+import bisect
+import contextlib
+import fnmatch
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - не Unix, блокировка только внутри процесса
+    fcntl = None
+
+from .dmemory import WILDCARDS
+from .idriver import IDriver, HistoryLostError
+
+# заголовок: метка, версия, номер записи, граница журнала удалений, ключей, удалённых
+HEADER = struct.Struct('<5sBxxQQII')
+MAGIC = b'RCSHM'
+VERSION = 1
+# ключ: смещение, длина ключа, длина значения (оно сразу за ключом), номер записи
+ENTRY = struct.Struct('<QIIQ')
+# удалённый ключ: смещение, длина, номер записи
+TOMB = struct.Struct('<QIQ')
+# через сколько секунд закрывается заменённый образ, чтения с ним успевают закончиться
+RETIRE_DELAY = 1.0
+
+
+class SharedMemoryDriver(IDriver):
+    """ Shared Memory Driver """
+
+    def __init__(self, connection_string: str = None, **kwargs):
+        """
+        Создаёт объект для доступа к данным
+        Ключи лежат в одном файле, который все процессы отображают в память,
+        запись собирает новый файл и атомарно подменяет старый
+        :param connection_string: 'shm://name' - файл redconfig-name в /dev/shm,
+            'shm:///path/to/file' - свой путь
+        :param check_interval: секунды между проверками, не заменён ли файл, по умолчанию 1,
+            0 - при каждом чтении. Свои записи видны сразу
+        :param history: сколько удалённых ключей помнить для changes()
+        """
+        if connection_string is None or not connection_string.startswith('shm://'):
+            raise ValueError('connection_string must starts with "shm://"')
+        path = connection_string[len('shm://'):]
+        if not path:
+            raise ValueError('shm:// needs a name or a path')
+        if '/' not in path:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            path = os.path.join(base, f'redconfig-{path}')
+        self.path = path
+        self.check_interval = float(kwargs.get('check_interval', 1.0))
+        self.history = int(kwargs.get('history', 1000))
+        self._lock = threading.RLock()
+        self._image = None
+        # заменённые образы: [(время подмены, образ)]
+        self._retired = []
+        self._checked = 0.0
+        if not os.path.exists(self.path):
+            self._update(lambda items, tombs: True)
+
+    def set(self, path: str, value: str) -> bool:
+        return self.set_many({path: value})
+
+    def set_many(self, path_value: dict) -> bool:
+        def apply(items, tombs):
+            for key, value in path_value.items():
+                items[key] = value
+                tombs.pop(key, None)
+            return True
+
+        return self._update(apply)
+
+    def get(self, path: str) -> str:
+        return self._view().get(path)
+
+    def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ Значения по списку ключей, с suffix ключи сначала ищутся по маске """
+        image = self._view()
+        res = {}
+        for key in keys:
+            if suffix:
+                for i, found in image.scan(key + suffix):
+                    res[found] = image.value(i)
+            elif (value := image.get(key)) is not None:
+                res[key] = value
+        return res
+
+    def get_many(self, path: str, not_path: str = '') -> dict or None:
+        image = self._view()
+        return {
+            key: image.value(i)
+            for i, key in image.scan(path)
+            if not (not_path and fnmatch.fnmatchcase(key, not_path))
+        }
+
+    def keys(self, path: str) -> list:
+        return [key for _, key in self._view().scan(path)]
+
+    def delete(self, path: str) -> list:
+        """ Delete Key """
+        return self.delete_many([path])
+
+    def delete_many(self, paths: list) -> list:
+        """ Delete many Keys """
+        def apply(items, tombs):
+            keys = [key for path in paths for key in fnmatch.filter(items, path)]
+            keys = list(dict.fromkeys(keys))
+            for key in keys:
+                del items[key]
+                tombs[key] = None
+            return keys
+
+        if not any(self._view().scan(path) for path in paths):
+            return []
+        return self._update(apply)
+
+    def changes(self, path: str, since: int = None) -> (dict, int):
+        """
+        Ключи, изменённые после записи с номером since
+        :param path: маска ключей
+        :param since: номер из предыдущего вызова, None - все ключи
+        :return: {ключ: значение, у удалённых None}, номер для следующего вызова
+        """
+        image = self._view()
+        if since is None:
+            return self.get_many(path), image.seq
+        if since == image.seq:
+            return {}, since
+        if since < image.floor:
+            # удаления после since уже забыты
+            raise HistoryLostError(f'{self.path}: history before {image.floor} is lost')
+        res = {}
+        for i in range(image.count):
+            if image.seq_of(i) > since and fnmatch.fnmatchcase(key := image.key(i), path):
+                res[key] = image.value(i)
+        for key, seq in image.tombs():
+            if seq > since and fnmatch.fnmatchcase(key, path):
+                res[key] = None
+        return res, image.seq
+
+    def close(self):
+        with self._lock:
+            for _, image in self._retired:
+                image.close()
+            self._retired.clear()
+            if self._image is not None:
+                self._image.close()
+                self._image = None
+
+    def _view(self) -> '_Image':
+        """ Текущий образ, файл отображается заново, если его заменил другой процесс """
+        image = self._image
+        now = time.monotonic()
+        if image is not None and now - self._checked < self.check_interval:
+            return image
+        stat = os.stat(self.path)
+        self._checked = now
+        if image is None or image.stamp != _stamp(stat):
+            with self._lock:
+                image = _Image.open(self.path)
+                self._retire(self._image)
+                self._image = image
+        return image
+
+    def _retire(self, image: '_Image' or None):
+        """ Откладывает закрытие заменённого образа, закрывает давно заменённые """
+        now = time.monotonic()
+        while self._retired and now - self._retired[0][0] > RETIRE_DELAY:
+            self._retired.pop(0)[1].close()
+        if image is not None:
+            self._retired.append((now, image))
+
+    def _update(self, apply):
+        """
+        Меняет ключи под блокировкой файла и атомарно подменяет файл
+        :param apply: apply(items, tombs) меняет словари ключ -> значение и
+            удалённые ключ -> номер записи, None - удалён сейчас
+        :return: результат apply
+        """
+        with self._lock, self._file_lock():
+            try:
+                image = _Image.open(self.path)
+            except FileNotFoundError:
+                image = _Image(b'', None)
+            with contextlib.closing(image):
+                seq = image.seq + 1
+                old = {key: (value, _seq) for key, value, _seq in image.entries()}
+                items = {key: value for key, (value, _) in old.items()}
+                tombs = dict(image.tombs())
+                floor = image.floor
+            res = apply(items, tombs)
+            # номер записи остаётся только у неизменённых ключей
+            entries = {
+                key: (value, old[key][1] if old.get(key, (None,))[0] == value else seq)
+                for key, value in items.items()
+            }
+            tombs = {key: seq if _seq is None else _seq for key, _seq in tombs.items()}
+            if len(tombs) > self.history:
+                ordered = sorted(tombs.items(), key=lambda item: item[1])
+                cut = len(ordered) - self.history
+                floor = max(floor, ordered[cut - 1][1])
+                tombs = dict(ordered[cut:])
+            self._write(_pack(entries, tombs, seq, floor))
+            self._retire(self._image)
+            self._image = None
+            return res
+
+    def _write(self, data: bytes):
+        folder, name = os.path.split(self.path)
+        fd, tmp = tempfile.mkstemp(dir=folder or None, prefix=f'.{name}.')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """ Записи разных процессов идут по очереди """
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class _Image:
+    """ Файл в памяти: заголовок, отсортированный индекс, удалённые ключи, ключи и значения """
+
+    def __init__(self, buf, stamp):
+        self.buf = buf
+        self.stamp = stamp
+        if len(buf) < HEADER.size:
+            self.seq = self.floor = self.count = self.tomb_count = 0
+            return
+        magic, version, self.seq, self.floor, self.count, self.tomb_count = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a redconfig shared memory file')
+        self.tomb_start = HEADER.size + ENTRY.size * self.count
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    @classmethod
+    def open(cls, path: str) -> '_Image':
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+        return cls(buf, _stamp(stat))
+
+    # последовательность ключей в байтах для bisect
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset, key_len, _, _ = ENTRY.unpack_from(self.buf, HEADER.size + ENTRY.size * i)
+        return self.buf[offset:offset + key_len]
+
+    def key(self, i: int) -> str:
+        return self[i].decode()
+
+    def value(self, i: int) -> str:
+        offset, key_len, value_len, _ = ENTRY.unpack_from(self.buf, HEADER.size + ENTRY.size * i)
+        return self.buf[offset + key_len:offset + key_len + value_len].decode()
+
+    def seq_of(self, i: int) -> int:
+        return ENTRY.unpack_from(self.buf, HEADER.size + ENTRY.size * i)[3]
+
+    def entries(self):
+        """ (ключ, значение, номер записи) по порядку ключей """
+        return ((self.key(i), self.value(i), self.seq_of(i)) for i in range(self.count))
+
+    def tombs(self):
+        for i in range(self.tomb_count):
+            offset, key_len, seq = TOMB.unpack_from(self.buf, self.tomb_start + TOMB.size * i)
+            yield self.buf[offset:offset + key_len].decode(), seq
+
+    def find(self, key: str) -> int:
+        _key = key.encode()
+        i = bisect.bisect_left(self, _key)
+        return i if i < self.count and self[i] == _key else -1
+
+    def get(self, key: str) -> str | None:
+        i = self.find(key)
+        return self.value(i) if i >= 0 else None
+
+    def scan(self, pattern: str) -> list:
+        """ [(номер, ключ)] по маске, перебираются только ключи с тем же префиксом """
+        match = WILDCARDS.search(pattern)
+        if match is None:
+            i = self.find(pattern)
+            return [(i, pattern)] if i >= 0 else []
+        prefix = pattern[:match.start()].encode()
+        res = []
+        for i in range(bisect.bisect_left(self, prefix), self.count):
+            _key = self[i]
+            if not _key.startswith(prefix):
+                break
+            if fnmatch.fnmatchcase(key := _key.decode(), pattern):
+                res.append((i, key))
+        return res
+
+
+def _pack(entries: dict, tombs: dict, seq: int, floor: int) -> bytes:
+    """
+    Собирает файл
+    :param entries: ключ -> (значение, номер записи)
+    :param tombs: удалённый ключ -> номер записи
+    """
+    pairs = sorted((key.encode(), value.encode(), _seq) for key, (value, _seq) in entries.items())
+    removed = [(key.encode(), _seq) for key, _seq in tombs.items()]
+    offset = HEADER.size + ENTRY.size * len(pairs) + TOMB.size * len(removed)
+    parts = [HEADER.pack(MAGIC, VERSION, seq, floor, len(pairs), len(removed))]
+    data = []
+    for key, value, _seq in pairs:
+        parts.append(ENTRY.pack(offset, len(key), len(value), _seq))
+        data += (key, value)
+        offset += len(key) + len(value)
+    for key, _seq in removed:
+        parts.append(TOMB.pack(offset, len(key), _seq))
+        data.append(key)
+        offset += len(key)
+    return b''.join(parts + data)
+
+
+def _stamp(stat: os.stat_result) -> tuple:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
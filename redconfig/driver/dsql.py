@@ -1,13 +1,198 @@
 """ SQL Driver"""
 
+import logging
+
 import sqlalchemy
-from sqlalchemy import Column, String, select, bindparam, delete, Table, MetaData, and_
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import Column, String, select, bindparam, delete, Table, MetaData, Index, \
+    and_, or_, any_, BigInteger, Integer, func, text
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+
+from .idriver import IDriver, HistoryLostError
 
-from .idriver import IDriver
+# триггер пишет в журнал ключ и номер транзакции при каждом изменении строки,
+# после каждой команды удаляет записи старше {keep} транзакций и запоминает границу в {floor}
+JOURNAL_FUNCTION = """
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+    IF TG_LEVEL = 'STATEMENT' THEN
+        DELETE FROM {journal} WHERE xid < txid_current() - {keep};
+        IF FOUND THEN
+            INSERT INTO {floor} (id, xid) VALUES (1, txid_current() - {keep})
+            ON CONFLICT (id) DO UPDATE SET xid = GREATEST({floor}.xid, EXCLUDED.xid);
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.key <> NEW.key) THEN
+        INSERT INTO {journal} (key, xid) VALUES (OLD.key, txid_current())
+        ON CONFLICT (key) DO UPDATE SET xid = EXCLUDED.xid;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO {journal} (key, xid) VALUES (NEW.key, txid_current())
+        ON CONFLICT (key) DO UPDATE SET xid = EXCLUDED.xid;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+JOURNAL_TRIGGER = """
+CREATE TRIGGER {trigger} AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH ROW EXECUTE PROCEDURE {function}()
+"""
+JOURNAL_PRUNE_TRIGGER = """
+CREATE TRIGGER {prune} AFTER INSERT OR UPDATE OR DELETE ON {table}
+FOR EACH STATEMENT EXECUTE PROCEDURE {function}()
+"""
 
 
-class SQLDriver(IDriver):
+class SQLStatements:
+    """ Таблица и запросы, общие для синхронного и асинхронного драйверов """
+
+    def _init_statements(self, table_name: str, **kwargs):
+        # сколько строк отправлять в одном INSERT и сколько ключей/масок в одном запросе
+        self.chunk_size = int(kwargs.get('chunk_size') or 1000)
+        meta = MetaData()
+        table = Table(table_name,
+                      meta,
+                      Column('key', String, primary_key=True),
+                      Column('value', String),
+                      )
+        # индекс для LIKE 'prefix%' и сравнений ~>=~ ~<~ при любой collation базы
+        self.index = Index(f'{table_name}_key_pattern_idx', table.c.key,
+                           postgresql_ops={'key': 'text_pattern_ops'})
+        self.table = table
+        # журнал изменений для changes(): ключ -> номер последней изменившей его транзакции,
+        # строки удалённых ключей хранятся journal_keep транзакций, потом changes() с более
+        # старым since недоступен. По умолчанию журнал не ведётся: триггер замедляет запись
+        self.journal = None
+        self.journal_keep = int(kwargs.get('journal_keep') or 100000)
+        if kwargs.get('journal'):
+            self.journal = Table(f'{table_name}_journal',
+                                 meta,
+                                 Column('key', String, primary_key=True),
+                                 Column('xid', BigInteger, nullable=False, index=True),
+                                 )
+            # одна строка: номер, до которого записи журнала удалены
+            self.journal_floor = Table(f'{table_name}_journal_floor',
+                                       meta,
+                                       Column('id', Integer, primary_key=True),
+                                       Column('xid', BigInteger, nullable=False),
+                                       )
+            self.floor_stmt = select(self.journal_floor.c.xid)
+        key = table.c.key
+        # условие на ключ для каждого вида пути, см. match()
+        where = {kind: condition(key, kind, bindparam('path'), bindparam('upper'))
+                 for kind in (EXACT, PREFIX, LIKE)}
+        self.select_stmt = {kind: select(table.c.key, table.c.value).where(cond)
+                            for kind, cond in where.items()}
+        self.select_key_stmt = {kind: select(table.c.key).where(cond)
+                                for kind, cond in where.items()}
+        self.select_value_stmt = {kind: select(table.c.value).where(cond)
+                                  for kind, cond in where.items()}
+        self.delete_stmt = {kind: delete(table).where(cond).returning(table.c.key)
+                            for kind, cond in where.items()}
+        self.upsert_stmt = insert(table).values(key=bindparam('path'), value=bindparam('value')) \
+            .on_conflict_do_update(index_elements=[table.c.key], set_=dict(value=bindparam('value'))) \
+            .execution_options(preserve_rowcount=True)
+        bulk_insert = insert(table)
+        self.bulk_upsert_stmt = bulk_insert \
+            .on_conflict_do_update(index_elements=[table.c.key],
+                                   set_=dict(value=bulk_insert.excluded.value)) \
+            .execution_options(preserve_rowcount=True)
+        # транзакции с номером меньше этого завершены, их изменения уже видны
+        self.marker_stmt = select(func.txid_snapshot_xmin(func.txid_current_snapshot()))
+        if self.journal is not None:
+            journal = self.journal
+            self.changes_stmt = {
+                kind: select(journal.c.key, table.c.value)
+                .select_from(journal.outerjoin(table, table.c.key == journal.c.key))
+                .where(journal.c.xid >= bindparam('since'))
+                .where(condition(journal.c.key, kind, bindparam('path'), bindparam('upper')))
+                for kind in (EXACT, PREFIX, LIKE)}
+
+    def _create_table(self, conn):
+        """ Создаёт таблицу и индекс, если их нет """
+        self.table.create(conn, checkfirst=True)
+        self.index.create(conn, checkfirst=True)
+        if self.journal is not None:
+            self._create_journal(conn)
+
+    def _create_journal(self, conn):
+        """ Создаёт журнал и триггер, без прав на них changes() недоступен """
+        name = self.table.name
+        quote = conn.dialect.identifier_preparer.quote
+        try:
+            with conn.begin_nested():
+                self.journal.create(conn, checkfirst=True)
+                self.journal_floor.create(conn, checkfirst=True)
+                exists = set(conn.scalars(
+                    text('SELECT tgname FROM pg_trigger '
+                         'WHERE tgrelid = CAST(:table AS regclass)'),
+                    dict(table=quote(name))))
+                if f'{name}_journal' not in exists:
+                    names = dict(table=quote(name),
+                                 journal=quote(self.journal.name),
+                                 floor=quote(self.journal_floor.name),
+                                 keep=self.journal_keep,
+                                 function=quote(f'{name}_journal'),
+                                 trigger=quote(f'{name}_journal'),
+                                 prune=quote(f'{name}_journal_prune'))
+                    conn.execute(text(JOURNAL_FUNCTION.format(**names)))
+                    conn.execute(text(JOURNAL_TRIGGER.format(**names)))
+                    conn.execute(text(JOURNAL_PRUNE_TRIGGER.format(**names)))
+        except Exception as err:
+            logging.warning('%s journal is disabled: %r', name, err)
+            self.journal = None
+
+    def _select_changes(self, path: str, since: int) -> tuple:
+        """ Запрос для changes и его параметры """
+        kind, params = match(path)
+        return self.changes_stmt[kind], dict(params, since=since)
+
+    def _check_floor(self, since: int, floor: int or None):
+        """ Удаления после since уже забыты - нужна полная загрузка, как без журнала """
+        if floor is not None and since < floor:
+            raise HistoryLostError(f'{self.journal.name}: history before {floor} is lost')
+
+    def _select_many(self, path: str, not_path: str = '') -> tuple:
+        """ Запрос для get_many и его параметры """
+        kind, params = match(path)
+        stmt = self.select_stmt[kind]
+        if not_path:
+            stmt = stmt.where(self.table.c.key.not_like(bindparam('not_path')))
+            params['not_path'] = not_path.replace('*', '%')
+        return stmt, params
+
+    def _select_batch(self, keys: list, suffix: str = '') -> list:
+        """ Запросы для get_batch, по одному на chunk_size ключей """
+        return [select(self.table.c.key, self.table.c.value).where(cond)
+                for cond in self._conditions([key + suffix for key in keys])]
+
+    def _delete_batch(self, paths: list) -> list:
+        """ Запросы для delete_many, по одному на chunk_size ключей или масок """
+        return [delete(self.table).where(cond).returning(self.table.c.key)
+                for cond in self._conditions(paths)]
+
+    def _conditions(self, paths: list) -> list:
+        """ Точные ключи через key = ANY(:keys), маски через OR """
+        exact = [path for path in paths if '*' not in path]
+        masks = [path for path in paths if '*' in path]
+        conditions = [self.table.c.key == any_(bindparam('keys', chunk, type_=ARRAY(String)))
+                      for chunk in self._chunks(exact)]
+        conditions.extend(or_(*[self._condition(mask) for mask in chunk])
+                          for chunk in self._chunks(masks))
+        return conditions
+
+    def _condition(self, path: str):
+        """ Условие на ключ со своими параметрами, можно объединять через OR """
+        kind, params = match(path)
+        return condition(self.table.c.key, kind, **params)
+
+    def _chunks(self, items: list):
+        for i in range(0, len(items), self.chunk_size):
+            yield items[i:i + self.chunk_size]
+
+
+class SQLDriver(SQLStatements, IDriver):
     """ SQL Driver"""
 
     def __init__(self, connection_string: str, *,
@@ -20,24 +205,9 @@ class SQLDriver(IDriver):
             connect_args=connect_args or {},
         )
         self.engine = engine
-        meta = MetaData()
-        table = Table(table_name,
-                      meta,
-                      Column('key', String, primary_key=True),
-                      Column('value', String),
-                      )
-        table.create(engine, checkfirst=True)
-        self.select_stmt = select(table.c.key, table.c.value) \
-            .where(and_(table.c.key.like(bindparam('path')),
-                        table.c.key.not_like(bindparam('not_path'))))
-        self.select_key_stmt = select(table.c.key) \
-            .where(table.c.key.like(bindparam('path')))
-        self.select_value_stmt = select(table.c.value) \
-            .where(table.c.key.like(bindparam('path')))
-        self.delete_stmt = delete(table) \
-            .where(table.c.key.like(bindparam('path'))).returning(table.c.key)
-        self.upsert_stmt = insert(table).values(key=bindparam('path'), value=bindparam('value')) \
-            .on_conflict_do_update(index_elements=[table.c.key], set_=dict(value=bindparam('value')))
+        self._init_statements(table_name, **kwargs)
+        with engine.begin() as conn:
+            self._create_table(conn)
 
     def set(self, path: str, value: str) -> bool:
         try:
@@ -50,35 +220,48 @@ class SQLDriver(IDriver):
         except Exception as err:
             raise err
 
-    def set_many(self, path_value: dict) -> bool:
+    def set_many(self, path_value: dict) -> int:
+        """ Upsert many values with multi-row INSERT ... ON CONFLICT, returns affected rows """
         if not path_value:
-            return False
+            return 0
         try:
-            params = [dict(path=path, value=value) for path, value in path_value.items()]
+            rows = [dict(key=path, value=value) for path, value in path_value.items()]
+            count = 0
             with self.engine.connect() as conn:
-                for par in params:
-                    res = conn.execute(self.upsert_stmt, par)
+                for chunk in self._chunks(rows):
+                    count += conn.execute(self.bulk_upsert_stmt.values(chunk)).rowcount
                 conn.commit()
-                if res.rowcount:
-                    return True
-                return False
+            return count
         except Exception as err:
             raise err
 
     def get(self, path: str) -> str:
         try:
+            kind, params = match(path)
             with self.engine.connect() as conn:
-                value = conn.scalar(self.select_value_stmt, dict(path=path.replace('*', '%')))
+                value = conn.scalar(self.select_value_stmt[kind], params)
             return value
         except Exception as err:
             raise err
 
+    def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ key = ANY(:keys), с suffix - одним запросом по всем маскам key + suffix """
+        if not keys:
+            return {}
+        try:
+            res = {}
+            with self.engine.connect() as conn:
+                for stmt in self._select_batch(keys, suffix):
+                    res.update((row.key, row.value) for row in conn.execute(stmt))
+            return res
+        except Exception as err:
+            raise err
+
     def get_many(self, path: str, not_path: str = '') -> dict or None:
         try:
+            stmt, params = self._select_many(path, not_path)
             with self.engine.connect() as conn:
-                res = conn.execute(self.select_stmt, dict(path=path.replace('*', '%'),
-                                                          not_path=not_path.replace('*', '%'),
-                                                          )).all()
+                res = conn.execute(stmt, params).all()
             if not res:
                 return None
             return {row.key: row.value for row in res}
@@ -87,34 +270,93 @@ class SQLDriver(IDriver):
 
     def keys(self, path: str) -> list:
         try:
+            kind, params = match(path)
             with self.engine.connect() as conn:
-                keys = list(conn.scalars(self.select_key_stmt, dict(path=path.replace('*', '%'))))
+                keys = list(conn.scalars(self.select_key_stmt[kind], params))
             return keys
         except Exception as err:
             raise err
 
     def delete(self, path: str) -> list:
         try:
+            kind, params = match(path)
             with self.engine.connect() as conn:
-                rows = conn.execute(self.delete_stmt, dict(path=path.replace('*', '%'))).fetchall()
+                rows = conn.execute(self.delete_stmt[kind], params).fetchall()
                 conn.commit()
             return [row.key for row in rows]
         except Exception as err:
             raise err
 
     def delete_many(self, paths: list) -> list:
-        """ Delete many Keys """
+        """ Delete many Keys: exact keys by key = ANY(:keys), masks by OR-ed conditions """
+        if not paths:
+            return []
         try:
             result = []
             with self.engine.connect() as conn:
-                for path in paths:
-                    rows = conn.execute(self.delete_stmt, dict(path=path.replace('*', '%'))).all()
-                    result.extend([row.key for row in rows])
+                for stmt in self._delete_batch(paths):
+                    result.extend(conn.scalars(stmt))
                 conn.commit()
             return result
         except Exception as err:
             raise err
 
+    def changes(self, path: str, since=None) -> (dict, int):
+        """
+        Ключи, изменённые транзакциями, которые не завершились к прошлому вызову
+        :param path: маска ключей
+        :param since: номер из предыдущего вызова, None - все ключи
+        :return: {ключ: значение, у удалённых None}, номер для следующего вызова
+        """
+        if self.journal is None:
+            return super().changes(path, since)
+        try:
+            with self.engine.connect() as conn:
+                # номер берётся до чтения, изменения во время чтения придут ещё раз
+                marker = conn.scalar(self.marker_stmt)
+                if since is None:
+                    stmt, params = self._select_many(path)
+                else:
+                    stmt, params = self._select_changes(path, since)
+                res = {row.key: row.value for row in conn.execute(stmt, params)}
+                # граница читается после журнала, удаление во время чтения тоже будет видно
+                if since is not None:
+                    self._check_floor(since, conn.scalar(self.floor_stmt))
+            return res, marker
+        except Exception as err:
+            raise err
+
     def close(self):
         if self.engine:
             self.engine.dispose()
+
+
+EXACT = 'exact'
+PREFIX = 'prefix'
+LIKE = 'like'
+
+
+def condition(key, kind: str, path, upper=None):
+    """ Условие на ключ для вида запроса из match() """
+    if kind == EXACT:
+        return key == path
+    if kind == PREFIX:
+        return and_(key.op('~>=~', is_comparison=True)(path),
+                    key.op('~<~', is_comparison=True)(upper))
+    return key.like(path)
+
+
+def match(path: str) -> (str, dict):
+    """
+    Выбирает вид запроса по пути
+    Путь без '*' ищется по равенству, 'prefix*' - диапазоном по индексу, остальное через LIKE
+    :return: вид запроса, параметры запроса
+    """
+    if '*' not in path:
+        return EXACT, dict(path=path)
+    prefix = path[:-1]
+    if path.endswith('*') and prefix and '*' not in prefix and ord(prefix[-1]) < 0xD7FF:
+        # первая строка больше всех строк с этим префиксом при побайтовом сравнении
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return PREFIX, dict(path=prefix, upper=upper)
+    return LIKE, dict(path=path.replace('*', '%'))
@@ -0,0 +1,112 @@
+""" Async Driver Interface """
+import asyncio
+from abc import ABCMeta, abstractmethod
+
+from .idriver import IDriver
+
+
+class IAsyncDriver(metaclass=ABCMeta):
+    """ Async Driver Interface """
+
+    @abstractmethod
+    def __init__(self, connection_string: str = None, **kwargs):
+        pass
+
+    @abstractmethod
+    async def set(self, path: str, value: str) -> bool:
+        """ Set Value """
+        pass
+
+    @abstractmethod
+    async def set_many(self, path_value: dict) -> bool:
+        """ Set Many Values """
+        pass
+
+    @abstractmethod
+    async def get(self, path: str) -> str:
+        """ Get Value """
+        pass
+
+    async def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ Get Values of many exact keys, see IDriver.get_batch """
+        found = await asyncio.gather(*(self.keys(key + suffix) for key in keys)) if suffix \
+            else [[key] for key in keys]
+        keys = [key for group in found for key in group]
+        values = await asyncio.gather(*(self.get(key) for key in keys))
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    @abstractmethod
+    async def get_many(self, path: str, not_path: str = '') -> dict or None:
+        """ Get All Values """
+        pass
+
+    @abstractmethod
+    async def keys(self, path: str) -> list:
+        """ List Keys """
+        pass
+
+    @abstractmethod
+    async def delete(self, path: str) -> list:
+        """ Delete Key """
+        pass
+
+    @abstractmethod
+    async def delete_many(self, paths: list) -> list:
+        """ Delete many Keys """
+        pass
+
+    async def changes(self, path: str, since=None) -> (dict, object):
+        """ Keys changed after marker since, see IDriver.changes """
+        raise NotImplementedError(f'{type(self).__name__} does not track changes')
+
+    @abstractmethod
+    async def close(self):
+        """ Close Storage """
+        pass
+
+
+class ThreadDriver(IAsyncDriver):
+    """ Синхронный драйвер, вызовы которого выполняются в пуле потоков """
+
+    def __init__(self, driver: IDriver = None, inline: bool = False, **kwargs):
+        """
+        :param driver: синхронный драйвер
+        :param inline: вызывать драйвер прямо в цикле событий, если он не ждёт ввода-вывода
+        """
+        self.driver = driver
+        self.inline = inline
+
+    async def _call(self, func, *args):
+        if self.inline:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def set(self, path: str, value: str) -> bool:
+        return await self._call(self.driver.set, path, value)
+
+    async def set_many(self, path_value: dict) -> bool:
+        return await self._call(self.driver.set_many, path_value)
+
+    async def get(self, path: str) -> str:
+        return await self._call(self.driver.get, path)
+
+    async def get_batch(self, keys: list, suffix: str = '') -> dict:
+        return await self._call(self.driver.get_batch, keys, suffix)
+
+    async def get_many(self, path: str, not_path: str = '') -> dict or None:
+        return await self._call(self.driver.get_many, path, not_path)
+
+    async def keys(self, path: str) -> list:
+        return await self._call(self.driver.keys, path)
+
+    async def delete(self, path: str) -> list:
+        return await self._call(self.driver.delete, path)
+
+    async def delete_many(self, paths: list) -> list:
+        return await self._call(self.driver.delete_many, paths)
+
+    async def changes(self, path: str, since=None) -> (dict, object):
+        return await self._call(self.driver.changes, path, since)
+
+    async def close(self):
+        return await self._call(self.driver.close)
@@ -2,6 +2,10 @@
 from abc import ABCMeta, abstractmethod
 
 
+class HistoryLostError(Exception):
+    """ Журнал изменений уже не помнит marker, нужна полная загрузка """
+
+
 class IDriver(metaclass=ABCMeta):
     """ Driver Interface """
 
@@ -24,6 +28,16 @@ class IDriver(metaclass=ABCMeta):
         """ Get Value """
         pass
 
+    def get_batch(self, keys: list, suffix: str = '') -> dict:
+        """ Get Values of many exact keys in one request, missing keys are omitted
+        With suffix every key + suffix is a mask and all matching keys are returned """
+        res = {}
+        for key in keys:
+            for found in self.keys(key + suffix) if suffix else [key]:
+                if (value := self.get(found)) is not None:
+                    res[found] = value
+        return res
+
     @abstractmethod
     def get_many(self, path: str, not_path: str = '') -> dict or None:
         """ Get All Values """
@@ -44,6 +58,18 @@ class IDriver(metaclass=ABCMeta):
         """ Delete many Keys """
         pass
 
+    def changes(self, path: str, since=None) -> (dict, object):
+        """ Keys matching path created, changed or deleted after marker since:
+        returns ({key: value, deleted keys have None}, new marker),
+        since=None returns all keys with the marker to continue from,
+        HistoryLostError - changes after since are already pruned from the journal """
+        raise NotImplementedError(f'{type(self).__name__} does not track changes')
+
+    def subscribe(self, path: str, callback):
+        """ Subscribe to changes: callback(key) for every changed key matching path,
+        returns an object with stop() """
+        raise NotImplementedError(f'{type(self).__name__} does not support subscriptions')
+
     @abstractmethod
     def close(self):
         """ Close Storage """
@@ -0,0 +1,99 @@
+""" inotify через ctypes, только Linux """
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import weakref
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# всё, что меняет список файлов каталога или их содержимое
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# struct inotify_event без имени: wd, mask, cookie, len
+_EVENT = struct.Struct("iIII")
+
+
+class Inotify:
+    """Неблокирующий дескриптор inotify с наблюдением за каталогами"""
+
+    def __init__(self):
+        """
+        Создаёт дескриптор
+        :raise OSError: inotify недоступен
+        """
+        name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not supported")
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+        # дескриптор закрывается и без close(), когда объект собран сборщиком мусора
+        self._finalizer = weakref.finalize(self, os.close, fd)
+
+    def add(self, path: str) -> int:
+        """
+        Наблюдает за каталогом, повторный вызов для того же каталога вернёт тот же wd
+        :param path: каталог
+        :return: номер наблюдения
+        :raise OSError: каталога нет или исчерпан лимит наблюдений
+        """
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(path), WATCH_MASK | IN_ONLYDIR
+        )
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read(self) -> list:
+        """
+        Вычитывает накопленные события, не блокируясь
+        :return: [(wd, mask), ...], при переполнении очереди wd = -1
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                events.append((wd, mask))
+                offset += _EVENT.size + length
+
+    def close(self):
+        """Закрывает дескриптор, повторный вызов ничего не делает"""
+        self._finalizer()
+        self.fd = -1
+
+
+def available() -> bool:
+    """inotify есть только в Linux"""
+    return sys.platform.startswith("linux")
@@ -1,6 +1,7 @@
 """ Helpers """
 import os
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from redconfig import ConfigManager
@@ -14,60 +15,98 @@ def set_configs_from_files(
     file_as_path=False,
     exclude=tuple(),
     with_attrs=False,
-):
+    workers: int = 8,
+    delete_missing=False,
+) -> dict:
     """
     Сохраняет конфиги из файлов в Хранилище
+    Текущие значения под root читаются одним запросом, записываются
+    одним пакетом только новые и изменённые слои
+    :param workers: сколько файлов читать одновременно, порядок файлов сохраняется
+    :param delete_missing: удалить слои под root, для которых нет файлов
+    :return: dict(added=, changed=, deleted=) - число слоёв
     """
-    bwd = os.getcwd()
-    os.chdir(ospath)
-    try:
-        params = {}
-        for pwd, _, names, _ in os.fwalk():
-            _pwd = pathlib.Path(pwd)
-            if set(_pwd.parts) & set(exclude):
+    files = []
+    for pwd, dirs, names in os.walk(ospath):
+        # каталоги по порядку, чтобы файлы одного ключа склеивались одинаково
+        dirs.sort()
+        _pwd = pathlib.Path(os.path.relpath(pwd, ospath))
+        if set(_pwd.parts) & set(exclude):
+            continue
+        pwd = str(_pwd)
+        print("setup", pwd)
+        for name in sorted(names):
+            if not name.endswith(ext):
                 continue
-            pwd = str(_pwd)
-            print("setup", pwd)
-            for name in sorted(names):
-                if not name.endswith(ext):
-                    continue
-                file_path = pathlib.Path(pwd, name)
-                if file_path.stem in exclude:
-                    continue
-                # print(file_path)
-                with open(file_path) as file:
-                    new = file.read()
-                    if new and new[-1] != "\n":
-                        new += "\n"
-                path = pwd.replace("/", ":")
-                if file_path.stem.startswith(":"):
-                    path = root + ":" + path + file_path.stem
-                else:
-                    if path == ".":
-                        path = root + (":" + file_path.stem if file_as_path else "")
-                    elif root:
-                        path = root + ":" + (file_path.stem if file_as_path else path)
-                if cfg := params.get(path):
-                    cfg["value"] += new
-                else:
-                    attrs = None
-                    if rc.with_attrs:
-                        old, old_attrs = rc.get_one(path, source=True)
-                        if old == new:
-                            continue
-                        attrs = dict(
-                            rev=int(old_attrs["rev"]) + 1 if old_attrs else 1,
-                            time=datetime.utcnow().isoformat(),
-                            user="anonymous",
-                        )
-                    cfg = dict(value=new, attrs=attrs)
-                if cfg["value"]:
-                    params[path] = cfg
-        if params:
-            print("set many to table...")
-            rc.set_many(params)
-    finally:
-        os.chdir(bwd)
+            file_path = pathlib.Path(pwd, name)
+            if file_path.stem in exclude:
+                continue
+            files.append((pwd, file_path))
+    params = {}
+    texts = _read_files([os.path.join(ospath, f) for _, f in files], workers)
+    for (pwd, file_path), new in zip(files, texts):
+        if new and new[-1] != "\n":
+            new += "\n"
+        path = pwd.replace("/", ":")
+        if file_path.stem.startswith(":"):
+            path = root + ":" + path + file_path.stem
+        else:
+            if path == ".":
+                path = root + (":" + file_path.stem if file_as_path else "")
+            elif root:
+                path = root + ":" + (file_path.stem if file_as_path else path)
+        params[path] = params.get(path, "") + new
+    # все текущие слои под root одним запросом к хранилищу, в кэше менеджера
+    # могут остаться уже удалённые или изменённые слои
+    current = {
+        path: entry
+        for path, entry in rc.stored(root + "*").items()
+        if not root or path == root or path.startswith(root + ":")
+    }
+    stats = dict(added=0, changed=0, deleted=0)
+    changed = {}
+    for path, new in params.items():
+        old, old_attrs = current.get(path, (None, None))
+        if not new or old == new:
+            continue
+        stats["added" if old is None else "changed"] += 1
+        attrs = None
+        if rc.with_attrs:
+            attrs = dict(
+                rev=int(old_attrs["rev"]) + 1 if old_attrs else 1,
+                time=datetime.utcnow().isoformat(),
+                user="anonymous",
+            )
+        changed[path] = dict(value=new, attrs=attrs)
+    missing = []
+    if delete_missing:
+        missing = [
+            path
+            for path in current
+            if path not in params and not set(path.split(":")) & set(exclude)
+        ]
+    if changed or missing:
+        print("set many to table...")
+        stats["deleted"] = len(rc.write_many(changed, current, missing))
+    return stats
+
+
+def _read_files(paths: list, workers: int) -> list:
+    """
+    Читает файлы, в сетевых файловых системах параллельно
+    :param paths: пути файлов
+    :param workers: наибольшее число одновременных чтений
+    :return: тексты в порядке paths
+    """
+
+    def read(file_path):
+        with open(file_path) as file:
+            return file.read()
+
+    if workers <= 1 or len(paths) <= 1:
+        return [read(file_path) for file_path in paths]
+    with ThreadPoolExecutor(min(workers, len(paths))) as pool:
+        return list(pool.map(read, paths))
 
 
 def set_from_file(rc: ConfigManager, path: str, file_name: str):
@@ -0,0 +1,129 @@
+""" Разбор слоёв и неизменяемые контейнеры """
+from typing import Any
+
+import yaml
+
+# libyaml в разы быстрее чистого python, если он собран
+_BaseLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class Loader(_BaseLoader):
+    """SafeLoader, который не превращает даты в date/datetime"""
+
+
+Loader.add_constructor(
+    "tag:yaml.org,2002:timestamp", Loader.yaml_constructors["tag:yaml.org,2002:str"]
+)
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+
+class FrozenDict(dict):
+    """Словарь только для чтения"""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class FrozenList(list):
+    """Список только для чтения"""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+yaml.SafeDumper.add_representer(FrozenDict, yaml.SafeDumper.represent_dict)
+yaml.SafeDumper.add_representer(FrozenList, yaml.SafeDumper.represent_list)
+
+
+def freeze(obj: Any, memo: dict = None) -> Any:
+    """
+    Делает копию объекта только для чтения
+    :param obj: результат yaml.safe_load
+    :param memo: уже замороженные объекты, общие ветки (якоря yaml) морозятся один раз
+    """
+    if not isinstance(obj, (dict, list)) or isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    return _copy(obj, FrozenDict, FrozenList, (FrozenDict, FrozenList), memo)
+
+
+def thaw(obj: Any) -> Any:
+    """
+    Делает изменяемую копию объекта
+    :param obj:
+    """
+    if not isinstance(obj, (dict, list)):
+        return obj
+    return _copy(obj, dict, list, (), None)
+
+
+def _copy(obj: Any, dict_type: type, list_type: type, skip: tuple, memo: dict) -> Any:
+    """
+    Копирует вложенные словари и списки без рекурсии
+    :param skip: типы, которые не копируются
+    :param memo: уже скопированные объекты по id
+    """
+    if memo is None:
+        memo = {}
+    if (copied := memo.get(id(obj))) is not None:
+        return copied
+    stack = [(obj, _items(obj), [])]
+    while True:
+        node, items, pairs = stack[-1]
+        for key, value in items:
+            if isinstance(value, (dict, list)) and not isinstance(value, skip):
+                if (copied := memo.get(id(value))) is None:
+                    # значение заполнится, когда будет скопирована вложенная ветка
+                    pairs.append((key, None))
+                    stack.append((value, _items(value), []))
+                    break
+                value = copied
+            pairs.append((key, value))
+        else:
+            stack.pop()
+            if isinstance(node, dict):
+                copied = dict_type(pairs)
+            else:
+                copied = list_type(value for _, value in pairs)
+            memo[id(node)] = copied
+            if not stack:
+                return copied
+            pairs = stack[-1][2]
+            pairs[-1] = (pairs[-1][0], copied)
+
+
+def _items(obj: dict or list):
+    return iter(obj.items()) if isinstance(obj, dict) else enumerate(obj)
+
+
+def parse(text: str) -> Any:
+    """
+    Разбирает текст слоя
+    :param text: yaml
+    :return: объект только для чтения
+    """
+    return freeze(yaml.load(text, Loader=Loader))
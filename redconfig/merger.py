@@ -1,83 +1,144 @@
 """ Слияние произвольных объектов """
 import itertools
+from types import GeneratorType
 from typing import Any, Callable
 
+from .layer import FrozenDict, FrozenList
+
 __merge_list = True
 
+# значения, которые списки соединяют друг за другом
+_SIMPLE = (str, int, float)
+
 
 def set_merge_list(val: bool):
     global __merge_list
     __merge_list = val
 
 
-def merge(a: Any, b: Any, replace: Callable, ext=False) -> Any:
-    """Сливает объекты a и b"""
-    if isinstance(b, list) or isinstance(a, list):
-        return merge_list(a, b, replace)
-    if isinstance(b, dict) or isinstance(a, dict):
-        return merge_dict(a, b, replace)
-    if ext and b is not None and a is not None:
-        # берем только значения, ключи не нужны
-        return [replace(a)[0], replace(b)[0]]
-    equal, _ = replace(b if b is not None else a)
-    return equal
+def merge(
+    a: Any, b: Any, replace: Callable, ext=False, merge_list: bool = None
+) -> Any:
+    """
+    Сливает объекты a и b
+    Ветки, которые не меняются, переиспользуются без копирования,
+    новые словари и списки создаются только для чтения
+    :param a: результат предыдущего merge, replace к нему повторно не применяется
+    :param b: слой
+    :param replace: замена плэйсхолдеров, вызывается один раз на значение слоя
+    :param ext: a и b - элементы списка, два простых значения дают список из обоих
+    :param merge_list: соединять списки простых значений, по умолчанию set_merge_list
+    """
+    if merge_list is None:
+        merge_list = __merge_list
+    return _Merge(replace, merge_list).run(a, b, ext)
 
 
 def merge_list(a: list, b: list, replace: Callable) -> list:
     """Сливает списки a и b"""
-    a_list = a or []
-    _equal = []
-    if __merge_list:
-        # соединяем списки друг за другом, если значения простые типы
-        b_list = b or []
-        iter_list = itertools.chain(a_list, b_list)
-        for x_val in iter_list:
-            if not isinstance(x_val, (str, int, float)):
-                break
-            _val = merge(None, x_val, replace, ext=True)
-            _equal.append(_val)
-        else:
-            return _equal or a_list
-    else:
-        # или совместимость с версией 0.10
-        if b is None:
-            return a_list
-        b_list = b or []
-        for x_val in b_list:
-            if not isinstance(x_val, (str, int, float)):
-                break
-            _val = merge(None, x_val, replace, ext=True)
-            _equal.append(_val)
-        else:
-            return _equal
-    # если значение объекты, мержим парами
-    _equal = []
-    for a_val, b_val in itertools.zip_longest(a_list, b_list):
-        _val = merge(a_val, b_val, replace, ext=True)
-        if isinstance(_val, list):
-            _equal.extend(_val)
-        else:
-            _equal.append(_val)
-    return _equal
+    return _Merge(replace, __merge_list).run(a or [], b)
 
 
 def merge_dict(a: dict, b: dict, replace: Callable) -> dict:
     """Сливает словари a и b"""
-    try:
-        _equal = {}
-        for key, a_val, b_val in _zip_dicts(a, b):
-            _b_val, _key = replace(b_val, key)
-            _val = merge(a_val, _b_val, replace)
-            _equal[_key] = merge(_equal.get(_key), _val, replace)
-        return _equal
-    except Exception as err:
-        raise err
-
-
-def _zip_dicts(a: dict, b: dict) -> (str, Any, Any):
-    """Соединение значений из двух словарей"""
-    a_dict = a or {}
-    b_dict = b or {}
-    fields = sorted(frozenset(a_dict.keys()) | frozenset(b_dict.keys()))
-    for key in fields:
-        yield key, a_dict.get(key), b_dict.get(key)
+    return _Merge(replace, __merge_list).run(a or {}, b or {})
+
+
+class _Merge:
+    """
+    Слияние без рекурсии: словари и списки обрабатываются генераторами,
+    которые отдают пары (a, b, ext) или (a, b, ext, replaced) вложенных значений
+    и получают результат
+    """
+
+    def __init__(self, replace: Callable, with_list: bool):
+        self.replace = replace
+        self.with_list = with_list
+
+    def run(self, a: Any, b: Any, ext=False) -> Any:
+        value = self.step(a, b, ext)
+        if not isinstance(value, GeneratorType):
+            return value
+        stack = [value]
+        value = None
+        while stack:
+            try:
+                args = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            value = self.step(*args)
+            if isinstance(value, GeneratorType):
+                stack.append(value)
+                value = None
+        return value
+
+    def step(self, a: Any, b: Any, ext: bool, replaced: bool = False) -> Any:
+        """
+        Результат для простых значений или генератор для словарей и списков
+        :param replaced: replace к b уже применён
+        """
+        if b is None:
+            # ветка есть только в a, она уже собрана
+            return a
+        if isinstance(b, dict):
+            return self.merge_dict(a if isinstance(a, dict) else None, b)
+        if isinstance(b, list):
+            return self.merge_list(a if isinstance(a, list) else None, b)
+        if not replaced:
+            b, _ = self.replace(b)
+        if ext and a is not None and not isinstance(a, (dict, list)):
+            # берем только значения, ключи не нужны
+            return [a, b]
+        return b
+
+    def merge_dict(self, a: dict or None, b: dict):
+        """Сливает словари, копируется только a, b возвращается как есть, если не изменился"""
+        _equal = dict(a) if a else {}
+        same = not a
+        # ключи по порядку, как в прежней версии: k идёт после <<k и перекрывает его
+        for key in sorted(b):
+            b_val = b[key]
+            _b_val, _key = self.replace(b_val, key)
+            _val = yield (a.get(key) if a else None), _b_val, False, True
+            if _key != key:
+                same = False
+                _equal.pop(key, None)
+                if (other := _equal.get(_key)) is not None:
+                    _val = yield other, _val, False, True
+            elif _val is not b_val:
+                same = False
+            _equal[_key] = _val
+        if same:
+            return b
+        return FrozenDict(_equal)
+
+    def merge_list(self, a: list or None, b: list):
+        """Сливает списки a и b"""
+        a_list = a or []
+        if all(isinstance(x, _SIMPLE) for x in b) and (
+            not self.with_list or all(isinstance(x, _SIMPLE) for x in a_list)
+        ):
+            _equal = [self.replace(x)[0] for x in b]
+            if self.with_list and a_list:
+                # соединяем списки друг за другом, если значения простые типы
+                return FrozenList(itertools.chain(a_list, _equal)) if b else a
+            # или совместимость с версией 0.10
+            if all(x is y for x, y in zip(_equal, b)):
+                return b
+            return FrozenList(_equal)
+        # если значение объекты, мержим парами
+        _equal = []
+        same = not a_list
+        for a_val, b_val in itertools.zip_longest(a_list, b):
+            _val = yield a_val, b_val, True
+            if isinstance(_val, list):
+                same = False
+                _equal.extend(_val)
+            else:
+                same = same and _val is b_val
+                _equal.append(_val)
+        if same:
+            return b
+        return FrozenList(_equal)
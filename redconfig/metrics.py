@@ -0,0 +1,250 @@
+""" Счётчики и гистограммы времени операций """
+import bisect
+import threading
+import time
+
+from .driver.iadriver import IAsyncDriver
+from .driver.idriver import IDriver, HistoryLostError
+
+# границы гистограмм времени, секунды
+TIME_BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+)
+# границы гистограммы глубины плэйсхолдеров
+DEPTH_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 16, 32)
+
+
+class MetricsHook:
+    """
+    Приёмник событий для экспорта, например в Prometheus или StatsD
+    Методы вызываются в потоке, где произошло событие
+    """
+
+    def count(self, name: str, value: int = 1):
+        """
+        Счётчик увеличился
+        :param name: имя счётчика
+        :param value: на сколько
+        """
+
+    def observe(self, name: str, value: float):
+        """
+        Новое значение гистограммы
+        :param name: имя гистограммы
+        :param value: секунды или глубина
+        """
+
+
+class Metrics(MetricsHook):
+    """
+    Счётчики и гистограммы в памяти процесса
+
+    Счётчики:
+        cache.hit, cache.miss, cache.negative_hit - поиск слоя в кэше
+        cache.evicted, cache.expired - слои, вытесненные из кэша или истёкшие
+        resolved.hit, resolved.miss - поиск собранного конфига
+        driver.<метод>.errors - вызовы драйвера с ошибкой
+    Гистограммы:
+        driver.<метод> - время вызова драйвера (get, get_batch, get_many, keys, ...)
+        parse - время разбора слоя
+        merge - время слияния слоёв конфига
+        placeholder.depth - глубина каждой собранной цели плэйсхолдера
+    """
+
+    def __init__(self, hooks: list = None):
+        """
+        :param hooks: MetricsHook, которым передаются все события
+        """
+        self.hooks = list(hooks or [])
+        self._lock = threading.Lock()
+        self._counters = {}
+        # имя -> [границы, число по корзинам, сумма, максимум]
+        self._histograms = {}
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        for hook in self.hooks:
+            hook.count(name, value)
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            if (hist := self._histograms.get(name)) is None:
+                buckets = DEPTH_BUCKETS if name == "placeholder.depth" else TIME_BUCKETS
+                hist = self._histograms[name] = [
+                    buckets,
+                    [0] * (len(buckets) + 1),
+                    0,
+                    0,
+                ]
+            hist[1][bisect.bisect_left(hist[0], value)] += 1
+            hist[2] += value
+            hist[3] = max(hist[3], value)
+        for hook in self.hooks:
+            hook.observe(name, value)
+
+    def snapshot(self) -> dict:
+        """
+        Копия текущих значений
+        :return: dict(counters={имя: число}, histograms={имя: dict(count, sum, max, buckets)}),
+            в buckets число значений не больше каждой границы, последняя граница - inf
+        """
+        with self._lock:
+            histograms = {}
+            for name, (bounds, counts, total, top) in self._histograms.items():
+                buckets = dict(zip([str(b) for b in bounds] + ["inf"], counts))
+                histograms[name] = dict(
+                    count=sum(counts), sum=total, max=top, buckets=buckets
+                )
+            return dict(counters=dict(self._counters), histograms=histograms)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def instrument(driver, metrics: Metrics):
+    """
+    Оборачивает драйвер, чтобы каждый вызов попадал в metrics
+    :param driver: IDriver или IAsyncDriver
+    :return: обёртка того же интерфейса
+    """
+    if isinstance(driver, (InstrumentedDriver, InstrumentedAsyncDriver)):
+        driver.metrics = metrics
+        return driver
+    if isinstance(driver, IAsyncDriver):
+        return InstrumentedAsyncDriver(driver, metrics)
+    return InstrumentedDriver(driver, metrics)
+
+
+def uninstrument(driver):
+    """
+    Снимает обёртку instrument
+    :return: исходный драйвер
+    """
+    if isinstance(driver, (InstrumentedDriver, InstrumentedAsyncDriver)):
+        return driver.driver
+    return driver
+
+
+class InstrumentedDriver(IDriver):
+    """Драйвер, который меряет время и ошибки каждого вызова вложенного драйвера"""
+
+    def __init__(self, driver: IDriver = None, metrics: Metrics = None, **kwargs):
+        self.driver = driver
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        # остальные атрибуты драйвера, например root_path
+        return getattr(self.driver, name)
+
+    def _call(self, name: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except HistoryLostError:
+            # не сбой: журнал забыл старые изменения, менеджер загрузит всё заново
+            raise
+        except Exception:
+            self.metrics.count(f"driver.{name}.errors")
+            raise
+        finally:
+            self.metrics.observe(f"driver.{name}", time.perf_counter() - start)
+
+    def set(self, path: str, value: str) -> bool:
+        return self._call("set", self.driver.set, path, value)
+
+    def set_many(self, path_value: dict) -> bool:
+        return self._call("set_many", self.driver.set_many, path_value)
+
+    def get(self, path: str) -> str:
+        return self._call("get", self.driver.get, path)
+
+    def get_batch(self, keys: list, suffix: str = "") -> dict:
+        return self._call("get_batch", self.driver.get_batch, keys, suffix)
+
+    def get_many(self, path: str, not_path: str = "") -> dict or None:
+        return self._call("get_many", self.driver.get_many, path, not_path)
+
+    def keys(self, path: str) -> list:
+        return self._call("keys", self.driver.keys, path)
+
+    def delete(self, path: str) -> list:
+        return self._call("delete", self.driver.delete, path)
+
+    def delete_many(self, paths: list) -> list:
+        return self._call("delete_many", self.driver.delete_many, paths)
+
+    def changes(self, path: str, since=None) -> (dict, object):
+        return self._call("changes", self.driver.changes, path, since)
+
+    def subscribe(self, path: str, callback):
+        return self.driver.subscribe(path, callback)
+
+    def close(self):
+        return self.driver.close()
+
+
+class InstrumentedAsyncDriver(IAsyncDriver):
+    """Асинхронный драйвер, который меряет время и ошибки каждого вызова"""
+
+    def __init__(self, driver: IAsyncDriver = None, metrics: Metrics = None, **kwargs):
+        self.driver = driver
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    async def _call(self, name: str, func, *args):
+        start = time.perf_counter()
+        try:
+            return await func(*args)
+        except HistoryLostError:
+            raise
+        except Exception:
+            self.metrics.count(f"driver.{name}.errors")
+            raise
+        finally:
+            self.metrics.observe(f"driver.{name}", time.perf_counter() - start)
+
+    async def set(self, path: str, value: str) -> bool:
+        return await self._call("set", self.driver.set, path, value)
+
+    async def set_many(self, path_value: dict) -> bool:
+        return await self._call("set_many", self.driver.set_many, path_value)
+
+    async def get(self, path: str) -> str:
+        return await self._call("get", self.driver.get, path)
+
+    async def get_batch(self, keys: list, suffix: str = "") -> dict:
+        return await self._call("get_batch", self.driver.get_batch, keys, suffix)
+
+    async def get_many(self, path: str, not_path: str = "") -> dict or None:
+        return await self._call("get_many", self.driver.get_many, path, not_path)
+
+    async def keys(self, path: str) -> list:
+        return await self._call("keys", self.driver.keys, path)
+
+    async def delete(self, path: str) -> list:
+        return await self._call("delete", self.driver.delete, path)
+
+    async def delete_many(self, paths: list) -> list:
+        return await self._call("delete_many", self.driver.delete_many, paths)
+
+    async def changes(self, path: str, since=None) -> (dict, object):
+        return await self._call("changes", self.driver.changes, path, since)
+
+    async def close(self):
+        return await self.driver.close()
@@ -0,0 +1,128 @@
+import asyncio
+
+from redconfig import AsyncConfigManager
+from redconfig.driver.daredis import AsyncRedisDriver
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_get_fails_for_every_waiter_when_driver_raises(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url)
+        await cm.set_many({"app": dict(value="a: 1", attrs=None)})
+        get_batch = cm.driver.get_batch
+        calls = []
+
+        async def failing_get_batch(keys, suffix=""):
+            calls.append(keys)
+            await asyncio.sleep(0.01)
+            raise ConnectionError("down")
+
+        cm.driver.get_batch = failing_get_batch
+        results = await asyncio.gather(
+            cm.get("app"), cm.get("app"), return_exceptions=True
+        )
+        assert all(isinstance(res, ConnectionError) for res in results), results
+        assert not cm._inflight
+        # после восстановления хранилища слой загружается
+        cm.driver.get_batch = get_batch
+        assert await cm.get("app") == {"a": 1}
+        await cm.close()
+
+    run(main())
+
+
+def test_concurrent_get_shares_one_fetch(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url)
+        await cm.set_many({"app": dict(value="a: 1", attrs=None)})
+        get_batch = cm.driver.get_batch
+        calls = []
+
+        async def counting_get_batch(keys, suffix=""):
+            calls.append(keys)
+            await asyncio.sleep(0.01)
+            return await get_batch(keys, suffix)
+
+        cm.driver.get_batch = counting_get_batch
+        results = await asyncio.gather(cm.get_one("app"), cm.get_one("app"))
+        assert [layer for layer, attrs in results] == [{"a": 1}, {"a": 1}]
+        assert len(calls) == 1
+        await cm.close()
+
+    run(main())
+
+
+def test_async_redis_get_batch_and_delete_many(redis_url):
+    async def main():
+        driver = AsyncRedisDriver(redis_url, scan_count=2)
+        await driver.set_many({"rc:a#rev=1": "1", "rc:a:b#rev=1": "2", "rc:c": "3"})
+        found = await driver.get_batch(["rc:a", "rc:a:b", "rc:x"], "#*")
+        assert found == {"rc:a#rev=1": "1", "rc:a:b#rev=1": "2"}
+        deleted = await driver.delete_many(["rc:a*", "rc:c", "rc:none"])
+        assert sorted(deleted) == ["rc:a#rev=1", "rc:a:b#rev=1", "rc:c"]
+        assert await driver.keys("rc:*") == []
+        await driver.close()
+
+    asyncio.run(main())
+
+
+def test_async_get_follows_writes_and_deletes(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url, with_attrs=False)
+        await cm.set("app", "a: 1\nref: $$db.host$$\n")
+        await cm.set("db", "host: h1\n")
+        await cm.set("app:svc", "b: 2\n")
+        assert await cm.get("app:svc") == {"a": 1, "ref": "h1", "b": 2}
+        await cm.set("db", "host: h2\n")
+        assert await cm.get("app:svc") == {"a": 1, "ref": "h2", "b": 2}
+        assert await cm.delete("app:svc")
+        assert await cm.get("app:svc") == {"a": 1, "ref": "h2"}
+        assert sorted(await cm.keys("*")) == ["app", "db"]
+        await cm.close()
+
+    run(main())
+
+
+def test_async_get_after_load_cache_reads_only_missing_layers(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url)
+        await cm.set_many(
+            {
+                "app": dict(value="a: 1", attrs=None),
+                "app:svc": dict(value="b: 2", attrs=None),
+            }
+        )
+        await cm.load_cache()
+        calls = []
+        get_batch = cm.driver.get_batch
+
+        async def counting(keys, suffix=""):
+            calls.append(keys)
+            return await get_batch(keys, suffix)
+
+        cm.driver.get_batch = counting
+        assert await cm.get("app:svc:x") == {"a": 1, "b": 2}
+        # загруженные слои не запрашиваются, отсутствующий - один раз
+        assert calls == [["rc:app:svc:x"]]
+        assert await cm.get("app:svc:x") == {"a": 1, "b": 2}
+        assert calls == [["rc:app:svc:x"]]
+        await cm.close()
+
+    run(main())
+
+
+def test_async_set_replaces_layer_created_by_another_manager(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url, with_attrs=True)
+        other = AsyncConfigManager(memory_url, with_attrs=True)
+        assert (await cm.get_one("app", source=True))[0] is None
+        await other.set("app", "x: 1")
+        await cm.set("app", "x: 2")
+        assert len(await cm.driver.keys("rc:app#*")) == 1
+        await cm.close()
+        await other.close()
+
+    run(main())
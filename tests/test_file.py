@@ -0,0 +1,126 @@
+import gc
+import os
+import threading
+
+import pytest
+
+from redconfig import ConfigManager
+from redconfig.driver import FileSystemDriver
+from redconfig.driver import inotify
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "mtime"])
+def make_driver(request, tmp_path):
+    drivers = []
+
+    def make(**kwargs):
+        kwargs.setdefault("inotify", request.param)
+        driver = FileSystemDriver(f"file://{tmp_path}", **kwargs)
+        drivers.append(driver)
+        return driver
+
+    yield make
+    for driver in drivers:
+        driver.close()
+
+
+def write(root, path, text, name=None):
+    folder = root.joinpath(*path.split(":"))
+    folder.mkdir(parents=True, exist_ok=True)
+    file = folder / (name or f"{folder.name}.yaml")
+    file.write_text(text)
+    return file
+
+
+def test_get_keys_and_get_many(make_driver, tmp_path):
+    write(tmp_path, "app", "a: 1\n")
+    write(tmp_path, "app:db", "host: h\n")
+    write(tmp_path, "app:db", "port: 1\n", name="extra.yaml")
+    write(tmp_path, "app:web", "port: 2\n")
+    write(tmp_path, "other", "x: 1\n")
+    driver = make_driver()
+    assert driver.get("app") == "a: 1\n"
+    assert driver.get("app:db") == "host: h\n\nport: 1\n"
+    assert driver.get("app:nope") is None
+    assert driver.keys("app:*") == ["app:db", "app:web"]
+    assert driver.keys("*") == ["app", "other"]
+    assert list(driver.get_many("app")) == ["app", "app:db", "app:web"]
+    assert list(driver.get_many("app", not_path="app:web")) == ["app", "app:db"]
+
+
+def test_index_follows_changes_on_disk(make_driver, tmp_path):
+    file = write(tmp_path, "app", "a: 1\n")
+    driver = make_driver()
+    assert driver.get_many("app") == {"app": "a: 1\n"}
+    # размер меняется, чтобы изменение было видно и без inotify при той же mtime
+    file.write_text("a: 22\n")
+    write(tmp_path, "app:new", "b: 1\n")
+    assert driver.get_many("app") == {"app": "a: 22\n", "app:new": "b: 1\n"}
+    os.remove(tmp_path / "app" / "new" / "new.yaml")
+    os.rmdir(tmp_path / "app" / "new")
+    assert driver.get_many("app") == {"app": "a: 22\n"}
+    assert driver.keys("app:*") == []
+
+
+def test_changes_reports_written_and_removed_keys(make_driver, tmp_path):
+    write(tmp_path, "app", "a: 1\n")
+    write(tmp_path, "app:db", "b: 1\n")
+    driver = make_driver()
+    found, marker = driver.changes("app")
+    assert found == {"app": "a: 1\n", "app:db": "b: 1\n"}
+    write(tmp_path, "app:db", "b: 22\n")
+    os.remove(tmp_path / "app" / "app.yaml")
+    found, marker = driver.changes("app", marker)
+    assert found == {"app": None, "app:db": "b: 22\n"}
+    assert driver.changes("app", marker)[0] == {}
+
+
+def test_manager_reads_file_tree(tmp_path):
+    write(tmp_path, "rc:app", "a: 1\nb: 1\n")
+    write(tmp_path, "rc:app:db", "b: 2\n")
+    cm = ConfigManager(f"file://{tmp_path}")
+    try:
+        assert cm.get("app:db") == {"a": 1, "b": 2}
+        cm.set("app:db", "b: 3\n")
+        assert cm.get("app:db") == {"a": 1, "b": 3}
+        assert (tmp_path / "rc" / "app" / "db" / "db.yaml").read_text() == "b: 3\n"
+    finally:
+        cm.close()
+
+
+@pytest.mark.skipif(not inotify.available(), reason="inotify is Linux only")
+def test_inotify_descriptor_is_released_without_close(tmp_path):
+    def open_fds():
+        return len(os.listdir("/proc/self/fd"))
+
+    before = open_fds()
+    driver = FileSystemDriver(f"file://{tmp_path}", inotify=True)
+    assert open_fds() == before + 1
+    del driver
+    gc.collect()
+    assert open_fds() == before
+    watcher = inotify.Inotify()
+    watcher.close()
+    watcher.close()
+    assert watcher.fd == -1
+
+
+def test_parallel_reads_keep_order(tmp_path):
+    for i in range(30):
+        for name in "cab":
+            write(tmp_path, f"app:k{i:02}", f"{name}: {i}\n", name=f"{name}.yaml")
+    serial = FileSystemDriver(f"file://{tmp_path}", read_workers=1, inotify=False)
+    parallel = FileSystemDriver(f"file://{tmp_path}", read_workers=8, inotify=False)
+    try:
+        expected = serial.get_many("app")
+        assert list(expected) == [f"app:k{i:02}" for i in range(30)]
+        assert expected["app:k07"] == "a: 7\n\nb: 7\n\nc: 7\n"
+        found = parallel.get_many("app")
+        assert list(found.items()) == list(expected.items())
+        assert any(
+            thread.name.startswith("redconfig-read") for thread in threading.enumerate()
+        )
+        assert parallel.changes("app")[0] == expected
+    finally:
+        serial.close()
+        parallel.close()
@@ -0,0 +1,70 @@
+import pytest
+from hazelcast.config import EvictionPolicy
+
+from redconfig.driver.dhazel import key_predicate, make_config, parse_connection
+
+
+def test_parse_connection():
+    user, password, members, dbs, options = parse_connection(
+        "hazelcast://us%40er:p%3Ass@h1:5701,h2:5702/configs?timeout=2&near_cache=on"
+    )
+    assert (user, password) == ("us@er", "p:ss")
+    assert members == ["h1:5701", "h2:5702"]
+    assert dbs == "configs"
+    assert options == dict(timeout="2", near_cache="on")
+    assert parse_connection("hazelcast:///configs") == ("", "", [], "configs", {})
+
+
+@pytest.mark.parametrize(
+    "url", ["hazelcast://h1:5701", "hazelcast://h1:5701/", "redis://h1/configs"]
+)
+def test_parse_connection_needs_map_name(url):
+    with pytest.raises(ValueError):
+        parse_connection(url)
+
+
+def test_make_config():
+    config = make_config("", "", [], "configs", {})
+    assert config.cluster_members == []
+    assert config.connection_timeout == 5.0
+    assert config.creds_username is None
+    assert config.near_caches == {}
+    options = dict(
+        timeout="2",
+        cluster_name="prod",
+        near_cache="yes",
+        near_cache_ttl="30",
+        near_cache_size="100",
+        near_cache_policy="lru",
+    )
+    config = make_config("u", "p", ["h1:5701"], "configs", options)
+    assert config.cluster_members == ["h1:5701"]
+    assert config.connection_timeout == 2.0
+    assert config.cluster_name == "prod"
+    assert (config.creds_username, config.creds_password) == ("u", "p")
+    near_cache = config.near_caches["configs"]
+    assert near_cache.time_to_live == 30.0
+    assert near_cache.eviction_max_size == 100
+    assert near_cache.eviction_policy == EvictionPolicy.LRU
+
+
+def test_make_config_near_cache_is_opt_in():
+    config = make_config("", "", [], "configs", dict(near_cache_ttl="30"))
+    assert config.near_caches == {}
+
+
+def test_key_predicate():
+    assert repr(key_predicate(["rc:a"])) == "InPredicate(attribute='__key', rc:a)"
+    assert repr(key_predicate(["rc:a:*"])) == (
+        "LikePredicate(attribute='__key', expression='rc:a:%')"
+    )
+    predicate = key_predicate(["rc:a", "rc:b", "rc:c:*"])
+    assert repr(predicate) == (
+        "OrPredicate(LikePredicate(attribute='__key', expression='rc:c:%'), "
+        "InPredicate(attribute='__key', rc:a,rc:b))"
+    )
+    predicate = key_predicate(["rc:*"], not_path="rc:x*")
+    assert repr(predicate) == (
+        "AndPredicate(LikePredicate(attribute='__key', expression='rc:%'), "
+        "NotPredicate(predicate=LikePredicate(attribute='__key', expression='rc:x%')))"
+    )
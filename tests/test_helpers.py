@@ -0,0 +1,62 @@
+from redconfig.helpers import set_configs_from_files
+
+
+def test_set_configs_from_files_diffs_against_storage(make_manager, tmp_path):
+    (tmp_path / "app.yaml").write_text("a: 1\n")
+    cm = make_manager(with_attrs=False)
+    cm.driver.set("rc:cfg", "a: 1\n")
+    assert cm.get("cfg") == {"a": 1}
+    # слой удалён из хранилища в обход менеджера, в кэше он остался
+    cm.driver.delete("rc:cfg")
+    stats = set_configs_from_files(cm, str(tmp_path), root="cfg")
+    assert stats == dict(added=1, changed=0, deleted=0)
+    assert cm.driver.get("rc:cfg") == "a: 1\n"
+
+
+def test_set_configs_from_files_keeps_file_order_with_workers(make_manager, tmp_path):
+    for i in range(20):
+        folder = tmp_path / f"k{i:02}"
+        folder.mkdir()
+        for name in "cab":
+            (folder / f"{name}.yaml").write_text(f"{name}{i}: 1")
+    serial = make_manager(with_attrs=False)
+    parallel = make_manager(with_attrs=False)
+    set_configs_from_files(serial, str(tmp_path), root="one", workers=1)
+    stats = set_configs_from_files(parallel, str(tmp_path), root="two", workers=8)
+    assert stats == dict(added=20, changed=0, deleted=0)
+    for i in range(20):
+        text = f"a{i}: 1\nb{i}: 1\nc{i}: 1\n"
+        assert serial.driver.get(f"rc:one:k{i:02}") == text
+        assert parallel.driver.get(f"rc:two:k{i:02}") == text
+
+
+def test_set_configs_from_files_bumps_revision_and_deletes_missing(
+    make_manager, tmp_path
+):
+    (tmp_path / "app.yaml").write_text("a: 1\n")
+    cm = make_manager(with_attrs=True)
+    cm.set("cfg", "a: 0\n", attrs=dict(rev=3, time="t", user="u"))
+    cm.set("cfg:gone", "b: 1\n", attrs=dict(rev=1, time="t", user="u"))
+    assert cm.get("cfg:gone") == {"a": 0, "b": 1}
+    stats = set_configs_from_files(cm, str(tmp_path), root="cfg", delete_missing=True)
+    assert stats == dict(added=0, changed=1, deleted=1)
+    stored = cm.stored("cfg*")
+    assert list(stored) == ["cfg"]
+    assert stored["cfg"][0] == "a: 1\n"
+    assert stored["cfg"][1]["rev"] == "4"
+    assert cm.get("cfg") == {"a": 1}
+    assert cm.get("cfg:gone") == {"a": 1}
+
+
+def test_write_many_reports_only_deleted_layers(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.set_many({k: dict(value=f"{k}: 1\n", attrs=None) for k in ("a", "b", "c")})
+    stored = cm.stored()
+    assert cm.get("b") == {"b": 1}
+    # слой уже удалён другим процессом
+    cm.driver.delete("rc:c")
+    changed = {"a": dict(value="a: 2\n", attrs=None)}
+    assert cm.write_many(changed, stored, ["b", "c"]) == ["b"]
+    assert cm.stored() == {"a": ("a: 2\n", None)}
+    assert cm.get("a") == {"a": 2}
+    assert cm.get("b") is None
@@ -0,0 +1,41 @@
+import pytest
+
+
+def test_get_one_returns_read_only_layer_parsed_once(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a:\n  b: [1, 2]\n")
+    layer, _ = cm.get_one("app")
+    assert layer == {"a": {"b": [1, 2]}}
+    assert cm.get_one("app")[0] is layer
+    with pytest.raises(TypeError):
+        layer["a"]["c"] = 3
+    with pytest.raises(TypeError):
+        layer["a"]["b"].append(3)
+
+
+def test_get_returns_mutable_copy(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a:\n  b: [1, 2]\n")
+    config = cm.get("app")
+    config["a"]["b"].append(3)
+    assert cm.get("app") == {"a": {"b": [1, 2]}}
+
+
+def test_get_one_source_returns_original_text(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.set("app", "a: 1  # comment\n")
+    assert cm.get_one("app", source=True)[0] == "a: 1  # comment\n"
+
+
+def test_timestamps_stay_strings(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "day: 2024-01-02\nat: 2024-01-02T03:04:05\n")
+    assert cm.get("app") == {"day": "2024-01-02", "at": "2024-01-02T03:04:05"}
+
+
+def test_changed_layer_is_parsed_again(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.set("app", "a: 1\n")
+    assert cm.get_one("app")[0] == {"a": 1}
+    cm.set("app", "a: 2\n")
+    assert cm.get_one("app")[0] == {"a": 2}
@@ -0,0 +1,85 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from redconfig import ConfigManager
+from redconfig.driver import MemoryDriver, SharedMemoryDriver
+from redconfig.driver import dshm
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_memory_keys_stay_sorted(make_manager):
+    cm = make_manager(with_attrs=False)
+    for key in ["b", "d", "a"]:
+        cm.set(key, f"{key}: 1\n")
+    cm.set_many({key: dict(value="x: 1\n", attrs=None) for key in ["e", "c", "a:b"]})
+    assert cm.keys("*") == ["a", "a:b", "b", "c", "d", "e"]
+    cm.delete_many(["b", "d"])
+    assert cm.keys("*") == ["a", "a:b", "c", "e"]
+    assert cm.get("a:b") == {"a": 1, "x": 1}
+
+
+def test_memory_index_is_updated_in_place(memory_url):
+    driver = MemoryDriver(memory_url)
+    index = driver.space.index
+    for i in range(100):
+        driver.set(f"k{99 - i:02}", "x")
+    driver.set_many({"a": "x", "z": "x"})
+    assert driver.space.index is index
+    assert driver.keys("k*") == [f"k{i:02}" for i in range(100)]
+    driver.close()
+
+
+def test_named_memory_is_freed_by_last_close(memory_url):
+    first = ConfigManager(memory_url, with_attrs=False)
+    second = ConfigManager(memory_url, with_attrs=False)
+    first.set("app", "x: 1\n")
+    first.close()
+    first.close()
+    assert second.get("app") == {"x": 1}
+    second.close()
+    third = ConfigManager(memory_url, with_attrs=False)
+    assert third.get("app") is None
+    third.close()
+
+
+@pytest.fixture
+def shm_url(tmp_path):
+    return f"shm://{tmp_path}/rc-{uuid.uuid4().hex}"
+
+
+def test_shm_sees_other_writers_after_check_interval(shm_url):
+    reader = SharedMemoryDriver(shm_url, check_interval=0.2)
+    writer = SharedMemoryDriver(shm_url)
+    try:
+        writer.set("a", "1")
+        reader.set("own", "1")
+        # свои записи видны сразу
+        assert reader.get("own") == "1"
+        writer.set("a", "2")
+        assert reader.get("a") == "1"
+        time.sleep(0.3)
+        assert reader.get("a") == "2"
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_shm_closes_replaced_mappings(shm_url, monkeypatch):
+    monkeypatch.setattr(dshm, "RETIRE_DELAY", 0.0)
+    before = open_fds()
+    reader = SharedMemoryDriver(shm_url, check_interval=0)
+    writer = SharedMemoryDriver(shm_url)
+    for i in range(20):
+        writer.set("a", str(i))
+        assert reader.get("a") == str(i)
+    # в каждом драйвере открыт текущий образ и, может быть, последний заменённый
+    assert open_fds() <= before + 4
+    writer.close()
+    reader.close()
+    assert open_fds() == before
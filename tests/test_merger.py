@@ -0,0 +1,49 @@
+from collections import Counter
+
+from redconfig import merger
+from redconfig.layer import freeze
+
+
+def counting_replace():
+    calls = Counter()
+
+    def replace(value, key=None):
+        if isinstance(value, str):
+            calls[value] += 1
+        return value, key
+
+    return replace, calls
+
+
+def test_replace_called_once_per_scalar():
+    replace, calls = counting_replace()
+    layer = freeze({"a": "x", "b": {"c": "y", "d": ["p", "q"]}, "e": [{"f": "z"}]})
+    result = merger.merge(None, layer, replace)
+    assert result == layer
+    assert calls == Counter({"x": 1, "y": 1, "p": 1, "q": 1, "z": 1})
+
+
+def test_replace_called_once_when_merging_over_existing():
+    replace, calls = counting_replace()
+    base = freeze({"a": "old", "b": {"c": "old"}})
+    layer = freeze({"a": "new", "b": {"c": "new2"}})
+    result = merger.merge(base, layer, replace)
+    assert result == {"a": "new", "b": {"c": "new2"}}
+    assert calls == Counter({"new": 1, "new2": 1})
+
+
+def test_replaced_key_merges_once():
+    calls = Counter()
+
+    def replace(value, key=None):
+        if isinstance(value, str):
+            calls[value] += 1
+        if key == "<<k":
+            return value, "k"
+        return value, key
+
+    result = merger.merge(None, freeze({"k": "a", "<<k": "b"}), replace)
+    assert result == {"k": "a"}
+    result = merger.merge(None, freeze({"<<k": "b", "k": "a"}), replace)
+    assert result == {"k": "a"}
+    assert calls == Counter({"a": 2, "b": 2})
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from redconfig import AsyncConfigManager, Metrics, MetricsHook
+from redconfig.driver import MemoryDriver
+
+
+@pytest.fixture
+def cm(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.driver.set_many({"rc:db": "host: h\n", "rc:app": "url: $$db.host$$\n"})
+    return cm
+
+
+def test_stats_are_empty_until_enabled(cm):
+    assert cm.stats() == {}
+    assert cm.get("app") == {"url": "h"}
+    assert cm.stats() == {}
+
+
+def test_get_counts_cache_and_resolved_lookups(cm):
+    cm.enable_metrics()
+    assert cm.get("app") == {"url": "h"}
+    assert cm.get("app") == {"url": "h"}
+    stats = cm.stats()
+    counters = stats["counters"]
+    assert counters["resolved.miss"] >= 1
+    assert counters["resolved.hit"] == 1
+    assert counters["cache.miss"] >= 2
+    histograms = stats["histograms"]
+    assert histograms["driver.get_batch"]["count"] >= 1
+    assert histograms["parse"]["count"] == 2
+    assert histograms["merge"]["count"] >= 1
+    assert histograms["placeholder.depth"]["buckets"]["1"] >= 1
+    hist = histograms["driver.get_batch"]
+    assert sum(hist["buckets"].values()) == hist["count"]
+    assert hist["max"] <= hist["sum"]
+
+
+def test_driver_errors_are_counted(cm):
+    cm.enable_metrics()
+
+    def broken(keys, suffix=""):
+        raise ConnectionError("down")
+
+    cm.driver.driver.get_batch = broken
+    with pytest.raises(ConnectionError):
+        cm.get("app")
+    counters = cm.stats()["counters"]
+    assert counters["driver.get_batch.errors"] == 1
+    assert cm.stats()["histograms"]["driver.get_batch"]["count"] == 1
+
+
+def test_hooks_and_shared_metrics(make_manager, cm):
+    events = []
+
+    class Hook(MetricsHook):
+        def count(self, name, value=1):
+            events.append(name)
+
+    metrics = Metrics()
+    other = make_manager(with_attrs=False)
+    assert cm.enable_metrics(metrics, hooks=[Hook()]) is metrics
+    assert other.enable_metrics(metrics) is metrics
+    cm.get("app")
+    other.get("db")
+    assert "resolved.miss" in events
+    assert metrics.snapshot()["counters"]["resolved.miss"] >= 2
+    metrics.reset()
+    assert metrics.snapshot() == dict(counters={}, histograms={})
+
+
+def test_disable_metrics_unwraps_driver(cm):
+    cm.enable_metrics()
+    assert not isinstance(cm.driver, MemoryDriver)
+    assert cm.driver.name == cm.driver.driver.name
+    cm.disable_metrics()
+    assert isinstance(cm.driver, MemoryDriver)
+    assert cm.stats() == {}
+    assert cm.get("app") == {"url": "h"}
+
+
+def test_evicted_layers_are_counted(make_manager):
+    cm = make_manager(with_attrs=False, cache_size=1)
+    cm.driver.set_many({"rc:a": "a: 1\n", "rc:b": "b: 1\n"})
+    cm.enable_metrics()
+    cm.get("a")
+    cm.get("b")
+    assert cm.stats()["counters"]["cache.evicted"] >= 1
+
+
+def test_async_manager_stats(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url)
+        await cm.set("app", "x: 1\n")
+        metrics = cm.enable_metrics()
+        assert await cm.get("app") == {"x": 1}
+        stats = metrics.snapshot()
+        assert stats["counters"]["cache.miss"] >= 1
+        assert stats["histograms"]["driver.get_batch"]["count"] == 1
+        assert stats["histograms"]["merge"]["count"] == 1
+        cm.disable_metrics()
+        assert cm.stats() == {}
+        await cm.close()
+
+    asyncio.run(main())
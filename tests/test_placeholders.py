@@ -0,0 +1,60 @@
+import pytest
+
+from redconfig import PlaceholderCycleError
+
+
+@pytest.fixture
+def cm(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.driver.set("rc:db", "host: h\nport: 5432\nname: main\n")
+    return cm
+
+
+def test_every_placeholder_in_a_string_is_substituted(cm):
+    cm.driver.set("rc:app", "url: http://$$db.host$$:$$db.port$$/$$db.name$$\n")
+    assert cm.get("app") == {"url": "http://h:5432/main"}
+
+
+def test_whole_value_placeholder_keeps_type(cm):
+    cm.driver.set("rc:app", "port: $$db.port$$\nconn: $$db$$\n")
+    assert cm.get("app") == {
+        "port": 5432,
+        "conn": {"host": "h", "port": 5432, "name": "main"},
+    }
+
+
+def test_key_placeholder_renames_key(cm):
+    cm.driver.set("rc:app", "<<host: $$db.host$$\n")
+    assert cm.get("app") == {"host": "h"}
+
+
+def test_unknown_placeholder_is_left_as_is(cm):
+    cm.driver.set("rc:app", "url: $$db.host$$/$$nope.x$$\n")
+    assert cm.get("app") == {"url": "h/$$nope.x$$"}
+
+
+def test_repeated_placeholder_target_is_fetched_once(cm):
+    cm.driver.set("rc:app", "hosts:\n" + "  - $$db.host$$\n" * 500)
+    keys = []
+    get_batch = cm.driver.get_batch
+
+    def counting(batch, suffix=""):
+        keys.extend(batch)
+        return get_batch(batch, suffix)
+
+    cm.driver.get_batch = counting
+    assert cm.get("app") == {"hosts": ["h"] * 500}
+    assert keys.count("rc:db") == 1
+
+
+def test_placeholder_target_change_rebuilds_config(cm):
+    cm.driver.set("rc:app", "host: $$db.host$$\n")
+    assert cm.get("app") == {"host": "h"}
+    cm.set("db", "host: h2\n")
+    assert cm.get("app") == {"host": "h2"}
+
+
+def test_placeholder_cycle_fails_fast_with_chain(cm):
+    cm.driver.set_many({"rc:a": "x: $$b.y$$\n", "rc:b": "y: $$a.x$$\n"})
+    with pytest.raises(PlaceholderCycleError, match="a -> b -> a"):
+        cm.get("a")
@@ -0,0 +1,168 @@
+import time
+
+import redis
+
+from redconfig import ConfigManager
+from redconfig.driver import RedisDriver
+
+
+def test_scan_and_chunked_reads_return_every_key(redis_url):
+    driver = RedisDriver(redis_url, scan_count=2, chunk_size=3)
+    driver.set_many({f"rc:app:{i}": str(i) for i in range(7)})
+    driver.set("rc:other", "x")
+    assert sorted(driver.keys("rc:app:*")) == [f"rc:app:{i}" for i in range(7)]
+    assert driver.get_many("rc:app:*") == {f"rc:app:{i}": str(i) for i in range(7)}
+    assert driver.keys("rc:app:1") == ["rc:app:1"]
+    assert driver.keys("rc:none") == []
+    driver.close()
+
+
+def test_delete_many_unlinks_keys_and_patterns_once(redis_url):
+    driver = RedisDriver(redis_url, scan_count=2, chunk_size=2)
+    driver.set_many({f"rc:app:{i}": str(i) for i in range(5)})
+    driver.set_many({"rc:a": "1", "rc:b": "2"})
+    deleted = driver.delete_many(["rc:app:*", "rc:a", "rc:app:1", "rc:none"])
+    assert sorted(deleted) == ["rc:a"] + [f"rc:app:{i}" for i in range(5)]
+    assert driver.keys("rc:*") == ["rc:b"]
+    assert driver.delete("rc:b") == ["rc:b"]
+    assert driver.delete("rc:b") == []
+    driver.close()
+
+
+def test_manager_reads_and_writes_through_redis(redis_url):
+    cm = ConfigManager(redis_url, with_attrs=True, scan_count=2)
+    cm.set("app", "a: 1\n")
+    cm.set("app:svc", "b: 2\n")
+    assert cm.get("app:svc") == {"a": 1, "b": 2}
+    cm.set("app", "a: 3\n")
+    assert cm.get("app:svc") == {"a": 3, "b": 2}
+    assert len(cm.driver.keys("rc:app#*")) == 1
+    cm.close()
+
+
+def wait_for(check, timeout=3.0):
+    """Ждёт, пока подписка доставит изменение"""
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "change was not delivered"
+        time.sleep(0.01)
+
+
+def test_watch_drops_layers_published_to_channel(redis_url):
+    cm = ConfigManager(redis_url, with_attrs=False, channel="rc-changes")
+    writer = RedisDriver(redis_url, channel="rc-changes")
+    writer.set("rc:app", "a: 1")
+    assert cm.get("app") == {"a": 1}
+    cm.watch()
+    time.sleep(0.1)
+    writer.set("rc:app", "a: 2")
+    wait_for(lambda: cm.get("app") == {"a": 2})
+    writer.delete("rc:app")
+    wait_for(lambda: cm.get("app") is None)
+    cm.unwatch()
+    cm.close()
+
+
+def test_watch_drops_layers_from_keyspace_notifications(redis_url):
+    cm = ConfigManager(redis_url, with_attrs=False)
+    cm.driver.redis.config_set("notify-keyspace-events", "Kg$x")
+    writer = RedisDriver(redis_url)
+    writer.set("rc:app", "a: 1")
+    assert cm.get("app") == {"a": 1}
+    cm.watch()
+    time.sleep(0.1)
+    writer.set("rc:app", "a: 2")
+    wait_for(lambda: cm.get("app") == {"a": 2})
+    cm.unwatch()
+    cm.close()
+
+
+def test_watch_backs_off_while_connection_is_lost(redis_url, caplog):
+    cm = ConfigManager(redis_url, with_attrs=False, channel="rc-changes")
+    writer = RedisDriver(redis_url, channel="rc-changes")
+    writer.set("rc:app", "a: 1")
+    assert cm.get("app") == {"a": 1}
+    pubsub = cm.watch().pubsub
+    time.sleep(0.1)
+    get_message = pubsub.get_message
+
+    def lost(**kwargs):
+        raise redis.ConnectionError("connection lost")
+
+    # поток ждёт сообщения до секунды, потом получает ошибку
+    pubsub.get_message = lost
+    time.sleep(1.6)
+    pubsub.get_message = get_message
+    retries = [r for r in caplog.records if "subscription lost" in r.getMessage()]
+    # паузы 0.1, 0.2, 0.4 секунды вместо повтора в цикле без остановки
+    assert 1 <= len(retries) <= 5
+    wait_for(lambda: writer.set("rc:app", "a: 2") and cm.get("app") == {"a": 2})
+    cm.unwatch()
+    cm.close()
+
+
+def count_scans(driver):
+    """Считает проходы SCAN по хранилищу"""
+    scans = []
+    scan_iter = driver.redis.scan_iter
+
+    def counting(**kwargs):
+        scans.append(kwargs["match"])
+        return scan_iter(**kwargs)
+
+    driver.redis.scan_iter = counting
+    return scans
+
+
+def test_get_batch_with_suffix_scans_once(redis_url):
+    driver = RedisDriver(redis_url, scan_count=2)
+    driver.set_many(
+        {
+            "rc:a#rev=1": "1",
+            "rc:a:b#rev=2": "2",
+            "rc:a:b*c#rev=1": "3",
+            "rc:ab#rev=1": "4",
+        }
+    )
+    scans = count_scans(driver)
+    found = driver.get_batch(["rc:a", "rc:a:b", "rc:a:b*c", "rc:a:x"], "#*")
+    assert found == {"rc:a#rev=1": "1", "rc:a:b#rev=2": "2", "rc:a:b*c#rev=1": "3"}
+    assert scans == ["rc:a*"]
+    driver.close()
+
+
+def test_delete_many_scans_once_for_all_masks(redis_url):
+    driver = RedisDriver(redis_url, scan_count=2)
+    driver.set_many({"rc:a:1": "1", "rc:a:2": "2", "rc:b:1": "3", "rc:c": "4"})
+    scans = count_scans(driver)
+    assert sorted(driver.delete_many(["rc:a:*", "rc:b:*", "rc:c"])) == [
+        "rc:a:1",
+        "rc:a:2",
+        "rc:b:1",
+        "rc:c",
+    ]
+    assert scans == ["rc:*"]
+    driver.close()
+
+
+def test_cold_get_fetches_hierarchy_in_one_call(redis_url):
+    cm = ConfigManager(redis_url, with_attrs=True)
+    cm.set("app", "a: 1\n")
+    cm.set("app:svc", "b: 2\n")
+    fresh = ConfigManager(redis_url, with_attrs=True)
+    calls = []
+    get_batch = fresh.driver.get_batch
+
+    def counting(keys, suffix=""):
+        calls.append(keys)
+        return get_batch(keys, suffix)
+
+    fresh.driver.get_batch = counting
+    scans = count_scans(fresh.driver)
+    assert fresh.get("app:svc:x") == {"a": 1, "b": 2}
+    assert calls == [["rc:app", "rc:app:svc", "rc:app:svc:x"]]
+    assert len(scans) == 1
+    assert fresh.get("app:svc:x") == {"a": 1, "b": 2}
+    assert len(calls) == 1
+    cm.close()
+    fresh.close()
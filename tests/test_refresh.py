@@ -0,0 +1,90 @@
+import asyncio
+
+from redconfig import AsyncConfigManager
+
+
+def test_refresh_picks_up_changes_of_another_manager(make_manager):
+    cm = make_manager()
+    other = make_manager()
+    cm.set("app", "x: 1\n")
+    cm.set("old", "y: 1\n")
+    assert cm.get("app") == {"x": 1}
+    assert cm.get("old") == {"y": 1}
+    other.set("app", "x: 2\n")
+    other.delete_many(["old"])
+    assert cm.refresh() == 2
+    assert cm.get("app") == {"x": 2}
+    assert cm.get("old") is None
+    assert cm.refresh() == 0
+
+
+def test_refresh_keeps_excluded_layers(make_manager):
+    cm = make_manager(with_attrs=False)
+    other = make_manager(with_attrs=False)
+    cm.set("app", "x: 1\n")
+    cm.set("skip", "y: 1\n")
+    assert cm.get("skip") == {"y": 1}
+    other.set("app", "x: 2\n")
+    other.set("skip", "y: 2\n")
+    cm.refresh(not_path="skip")
+    assert cm.get("app") == {"x": 2}
+    assert cm.get("skip") == {"y": 1}
+
+
+def _write_while_reading(cm, method, write):
+    """Пишет через cm после того, как driver.<method> прочитал хранилище"""
+    read = getattr(cm.driver, method)
+
+    def racing(*args, **kwargs):
+        found = read(*args, **kwargs)
+        write()
+        return found
+
+    setattr(cm.driver, method, racing)
+
+
+def test_set_during_refresh_is_not_overwritten(make_manager):
+    cm = make_manager()
+    cm.set("app", "x: 1\n")
+    assert cm.get("app") == {"x": 1}
+    _write_while_reading(cm, "get_many", lambda: cm.set("app", "x: 2\n"))
+    cm.refresh()
+    assert cm.get("app") == {"x": 2}
+
+
+def test_delete_during_refresh_is_not_undone(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.set("app", "x: 1\n")
+    assert cm.get("app") == {"x": 1}
+    _write_while_reading(cm, "get_many", lambda: cm.delete("app"))
+    cm.refresh()
+    assert cm.get("app") is None
+
+
+def test_set_during_full_sync_is_not_overwritten(make_manager):
+    cm = make_manager()
+    cm.set("app", "x: 1\n")
+    assert cm.get("app") == {"x": 1}
+    _write_while_reading(cm, "changes", lambda: cm.set("app", "x: 2\n"))
+    cm.sync_since(None)
+    assert cm.get("app") == {"x": 2}
+
+
+def test_async_set_during_refresh_is_not_overwritten(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url)
+        await cm.set("app", "x: 1\n")
+        assert await cm.get("app") == {"x": 1}
+        get_many = cm.driver.get_many
+
+        async def racing(*args):
+            found = await get_many(*args)
+            await cm.set("app", "x: 2\n")
+            return found
+
+        cm.driver.get_many = racing
+        await cm.refresh()
+        assert await cm.get("app") == {"x": 2}
+        await cm.close()
+
+    asyncio.run(main())
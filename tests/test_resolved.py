@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from redconfig.cache import LayerCache
+
+
+def test_get_sees_layer_loaded_by_get_one(make_manager):
+    cm = make_manager(negative_ttl=0.05)
+    cm.driver.set("rc:app", "a: 1")
+    assert cm.get("app:svc") == {"a": 1}
+    # слой появился в хранилище в обход менеджера
+    cm.driver.set("rc:app:svc", "b: 2")
+    time.sleep(0.06)
+    assert cm.get_one("app:svc")[0] == {"b": 2}
+    assert cm.get("app:svc") == {"a": 1, "b": 2}
+
+
+def test_layer_loaded_during_build_is_not_memoized_as_missing(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a: 1")
+    layer_targets = cm._layer_targets
+
+    def racing(key):
+        if key == "rc:app:svc" and key not in cm.cache:
+            # другой поток загрузил слой, которого эта сборка не нашла
+            cm.cache[key] = ("b: 2", None)
+        return layer_targets(key)
+
+    cm._layer_targets = racing
+    assert cm.get("app:svc") == {"a": 1}
+    assert "app:svc" not in cm._resolved
+    assert cm.get("app:svc") == {"a": 1, "b": 2}
+
+
+def test_get_missing_layer_staleness_bounded_by_negative_ttl(make_manager):
+    cm = make_manager(negative_ttl=0.05)
+    cm.driver.set("rc:app", "a: 1")
+    assert cm.get("app:svc") == {"a": 1}
+    cm.driver.set("rc:app:svc", "b: 2")
+    # пока запись об отсутствии жива, отдаётся запомненный конфиг
+    assert cm.get("app:svc") == {"a": 1}
+    time.sleep(0.06)
+    assert cm.get("app:svc") == {"a": 1, "b": 2}
+
+
+def test_get_without_negative_cache_reads_missing_layers_every_time(make_manager):
+    cm = make_manager(negative_ttl=0)
+    cm.driver.set("rc:app", "a: 1")
+    assert cm.get("app:svc") == {"a": 1}
+    cm.driver.set("rc:app:svc", "b: 2")
+    assert cm.get("app:svc") == {"a": 1, "b": 2}
+
+
+def test_get_with_all_layers_present_stays_memoized(make_manager):
+    cm = make_manager(negative_ttl=0.01)
+    cm.driver.set_many({"rc:app": "a: 1", "rc:app:svc": "b: 2"})
+    config = cm.get("app:svc", readonly=True)
+    time.sleep(0.02)
+    assert cm.get("app:svc", readonly=True) is config
+
+
+def test_build_reads_and_fills_its_view_after_cache_swap(make_manager):
+    cm = make_manager()
+    cm.driver.set_many({"rc:app": "a: 1", "rc:app:svc": "b: 1"})
+    get_batch = cm.driver.get_batch
+
+    def swapping(keys, suffix=""):
+        found = get_batch(keys, suffix)
+        # refresh подменил кэш, пока сборка ждала хранилище
+        with cm._lock:
+            cm.cache = LayerCache({"rc:app:svc": ("b: 2", None)})
+            cm._generation += 1
+        return found
+
+    cm.driver.get_batch = swapping
+    assert cm.get("app:svc") == {"a": 1, "b": 1}
+    assert "app:svc" not in cm._resolved
+
+
+@pytest.mark.parametrize("limit", [dict(cache_size=10), dict(cache_bytes=400)])
+def test_bounded_cache_bounds_resolved_configs(make_manager, limit):
+    cm = make_manager(**limit)
+    cm.driver.set_many(
+        {"rc:app": "a: 1", **{f"rc:app:t{i}": f"b: {i}" for i in range(100)}}
+    )
+    for i in range(100):
+        assert cm.get(f"app:t{i}") == {"a": 1, "b": i}
+    retained = len(cm.cache)
+    assert retained < 100
+    assert len(cm._parsed) <= retained
+    assert len(cm._resolved) <= retained
+    assert len(cm._dependents) <= retained
+    # вытеснение чужих слоёв не мешает запомнить только что собранный конфиг
+    assert "app:t99" in cm._resolved
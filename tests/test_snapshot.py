@@ -0,0 +1,38 @@
+import pytest
+
+from redconfig.driver import HistoryLostError
+
+
+def test_snapshot_reconciles_by_change_marker(make_manager, tmp_path):
+    snapshot = str(tmp_path / "rc.snap")
+    cm = make_manager(with_attrs=False)
+    cm.driver.set_many({"rc:app": "a: 1", "rc:old": "b: 1"})
+    cm.sync_since()
+    assert cm.save_snapshot(snapshot) == 2
+    cm.driver.set("rc:app", "a: 2")
+    cm.driver.delete("rc:old")
+
+    fresh = make_manager(with_attrs=False)
+    get_many = fresh.driver.get_many
+    fresh.driver.get_many = lambda *args: pytest.fail("full reload")
+    assert fresh.load_snapshot(snapshot) == 2
+    fresh.driver.get_many = get_many
+    assert fresh.cache["rc:app"][0] == "a: 2"
+    assert "rc:old" not in fresh.cache
+
+
+def test_sync_since_reloads_all_layers_when_history_is_lost(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.driver.set("rc:app", "a: 1")
+    marker = cm.sync_since()
+    cm.driver.set("rc:app", "a: 2")
+    changes = cm.driver.changes
+
+    def forgetting(path, since=None):
+        if since is not None:
+            raise HistoryLostError("history is lost")
+        return changes(path, since)
+
+    cm.driver.changes = forgetting
+    assert cm.sync_since(marker) is not None
+    assert cm.get("app") == {"a": 2}
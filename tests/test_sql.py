@@ -0,0 +1,45 @@
+from sqlalchemy import inspect
+
+from redconfig.driver.dsql import EXACT, LIKE, PREFIX, match
+
+
+def test_set_many_upserts_in_chunks_and_counts_rows(make_sql_driver):
+    driver = make_sql_driver(chunk_size=3)
+    assert driver.set_many({f"rc:k{i}": str(i) for i in range(7)}) == 7
+    assert driver.set_many({"rc:k1": "x", "rc:k9": "y"}) == 2
+    assert driver.set_many({}) == 0
+    assert driver.get("rc:k1") == "x"
+    assert len(driver.keys("rc:*")) == 8
+
+
+def test_delete_many_combines_keys_and_masks(make_sql_driver):
+    driver = make_sql_driver(chunk_size=2)
+    driver.set_many({f"rc:k{i}": str(i) for i in range(7)})
+    driver.set_many({"rc:app:a": "1", "rc:app:b": "2"})
+    deleted = driver.delete_many(["rc:k1", "rc:k2", "rc:k3", "rc:app:*", "rc:none"])
+    assert sorted(deleted) == ["rc:app:a", "rc:app:b", "rc:k1", "rc:k2", "rc:k3"]
+    assert driver.delete_many(["rc:k1"]) == []
+    assert sorted(driver.keys("rc:*")) == ["rc:k0", "rc:k4", "rc:k5", "rc:k6"]
+
+
+def test_match_picks_equality_prefix_range_or_like():
+    assert match("rc:app") == (EXACT, dict(path="rc:app"))
+    assert match("rc:app:*") == (PREFIX, dict(path="rc:app:", upper="rc:app;"))
+    assert match("rc:*:svc") == (LIKE, dict(path="rc:%:svc"))
+    assert match("*") == (LIKE, dict(path="%"))
+
+
+def test_lookups_by_key_prefix_and_mask(make_sql_driver):
+    driver = make_sql_driver()
+    driver.set_many({"rc:app": "1", "rc:app:svc": "2", "rc:apx": "3", "rc:db:svc": "4"})
+    assert driver.get("rc:app") == "1"
+    assert driver.get("rc:ap") is None
+    assert sorted(driver.keys("rc:app*")) == ["rc:app", "rc:app:svc"]
+    assert sorted(driver.keys("rc:*:svc")) == ["rc:app:svc", "rc:db:svc"]
+    assert driver.get_many("rc:*", "rc:app*") == {"rc:apx": "3", "rc:db:svc": "4"}
+
+
+def test_create_table_adds_pattern_index(make_sql_driver):
+    driver = make_sql_driver()
+    indexes = inspect(driver.engine).get_indexes(driver.table.name)
+    assert f"{driver.table.name}_key_pattern_idx" in [i["name"] for i in indexes]
@@ -0,0 +1,59 @@
+import logging
+
+from redconfig.configmanager import SUB_PATH_LIMIT, ConfigManager
+
+
+def test_sub_path_order_is_fixed():
+    assert ConfigManager.sub_path("a+b:c") == ["a:c", "b:c", "a:b:c", "b:a:c"]
+    assert ConfigManager.sub_path("app") == ["app"]
+
+
+def test_sub_path_drops_repeats():
+    assert ConfigManager.sub_path("a+a:c") == ["a:c"]
+    assert ConfigManager.sub_path("a+:c") == ["a:c"]
+    variants = ConfigManager.sub_path("a+b:a+b")
+    assert len(variants) == len(set(variants))
+
+
+def test_sub_path_is_capped(caplog):
+    path = "+".join("abcdefghij")
+    variants = ConfigManager.sub_path(path)
+    assert len(variants) == SUB_PATH_LIMIT
+    assert variants[:10] == list("abcdefghij")
+    assert len(ConfigManager.sub_path(path, limit=5)) == 5
+    with caplog.at_level(logging.WARNING):
+        variants = ConfigManager.sub_path(path + ":x+y")
+    assert len(variants) == SUB_PATH_LIMIT
+    assert "more than" in caplog.text
+
+
+def test_layer_paths_expands_every_prefix(make_manager):
+    cm = make_manager()
+    assert cm.layer_paths("app+x:y") == [
+        "app",
+        "x",
+        "app:x",
+        "x:app",
+        "app:y",
+        "x:y",
+        "app:x:y",
+        "x:app:y",
+    ]
+
+
+def test_layer_paths_are_memoized(make_manager):
+    cm = make_manager()
+    path = "+".join("abcdefghij") + ":k"
+    first = cm.layer_paths(path)
+    first.append("junk")
+    assert cm.layer_paths(path) == first[:-1]
+    assert len(cm.layer_paths(path)) == 2 * SUB_PATH_LIMIT
+
+
+def test_get_merges_layers_in_sub_path_order(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.driver.set("rc:a", "x: a\nonly_a: 1\n")
+    cm.driver.set("rc:b", "x: b\n")
+    cm.driver.set("rc:a:b", "y: ab\n")
+    cm.driver.set("rc:b:a", "y: ba\n")
+    assert cm.get("a+b") == {"x": "b", "only_a": 1, "y": "ba"}
@@ -0,0 +1,108 @@
+import asyncio
+import uuid
+
+import pytest
+
+from redconfig import AsyncConfigManager, ConfigManager
+from redconfig.driver import HistoryLostError
+
+
+def check_sync(cm, writer):
+    """sync_since подхватывает запись и удаление, а после потери журнала - всё заново"""
+    writer.set_many({k: dict(value="x: 1\n", attrs=None) for k in "abcd"})
+    marker = cm.sync_since()
+    assert marker is not None
+    assert cm.get("a") == {"x": 1}
+    assert cm.get("b") == {"x": 1}
+    writer.set("a", "x: 2\n")
+    writer.delete_many(["b"])
+    marker = cm.sync_since(marker)
+    assert cm.get("a") == {"x": 2}
+    assert cm.get("b") is None
+    assert cm.sync_since(marker) == marker
+    # удалений больше, чем помнит журнал
+    for key in "cd":
+        writer.delete_many([key])
+    writer.set("a", "x: 3\n")
+    with pytest.raises(HistoryLostError):
+        cm.driver.changes("rc:*", marker)
+    metrics = cm.enable_metrics()
+    marker = cm.sync_since(marker)
+    assert marker is not None
+    assert cm.get("a") == {"x": 3}
+    assert cm.get("c") is None
+    counters = metrics.snapshot()["counters"]
+    assert not any(name.endswith(".errors") for name in counters), counters
+
+
+def test_memory_sync_since(make_manager):
+    check_sync(
+        make_manager(with_attrs=False, history=1), make_manager(with_attrs=False)
+    )
+
+
+def test_memory_history_is_bounded(memory_url):
+    cm = ConfigManager(memory_url, with_attrs=False, history=3)
+    for i in range(100):
+        cm.set(f"k{i}", "x: 1\n")
+        cm.delete_many([f"k{i}"])
+    space = cm.driver.space
+    assert len(space.tombs) == 3
+    assert not space.changed
+    cm.close()
+
+
+def test_shm_sync_since(tmp_path):
+    url = f"shm://{tmp_path}/rc"
+    # историю обрезает тот, кто пишет, чужие записи видны без задержки
+    cm = ConfigManager(url, with_attrs=False, history=1, check_interval=0)
+    writer = ConfigManager(url, with_attrs=False, history=1)
+    try:
+        check_sync(cm, writer)
+    finally:
+        writer.close()
+        cm.close()
+
+
+def test_redis_sync_since(redis_url):
+    kwargs = dict(with_attrs=False, journal="rc:journal", journal_keep=2)
+    cm = ConfigManager(redis_url, **kwargs)
+    writer = ConfigManager(redis_url, **kwargs)
+    check_sync(cm, writer)
+
+
+def test_driver_without_journal_refreshes(redis_url):
+    cm = ConfigManager(redis_url, with_attrs=False)
+    cm.set("a", "x: 1\n")
+    assert cm.get("a") == {"x": 1}
+    cm.driver.set("rc:a", "x: 2\n")
+    assert cm.sync_since() is None
+    assert cm.get("a") == {"x": 2}
+
+
+def test_sql_changes_below_floor_raise_history_lost(make_sql_driver):
+    driver = make_sql_driver(journal=True, journal_keep=1)
+    driver.set("rc:a", "x: 1\n")
+    _, marker = driver.changes("rc:*")
+    for i in range(3):
+        driver.set(f"rc:k{i}", "x: 1\n")
+        driver.delete_many([f"rc:k{i}"])
+    with pytest.raises(HistoryLostError):
+        driver.changes("rc:*", marker)
+
+
+def test_async_sync_since_after_history_lost(memory_url):
+    async def main():
+        cm = AsyncConfigManager(memory_url, history=1)
+        await cm.set("a", "x: 1\n")
+        marker = await cm.sync_since()
+        assert await cm.get("a") == {"x": 1}
+        for key in "bc":
+            await cm.set(key, "x: 1\n")
+            await cm.delete_many([key])
+        await cm.driver.set("rc:a", "x: 2\n")
+        assert await cm.sync_since(marker) is not None
+        assert await cm.get("a") == {"x": 2}
+        await cm.close()
+
+    asyncio.run(main())
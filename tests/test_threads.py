@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from redconfig.configmanager import PlaceholderCycleError
+
+
+def count_batches(cm, delay=0.0, hook=None):
+    """Оборачивает get_batch драйвера, считает запросы"""
+    calls = []
+    get_batch = cm.driver.get_batch
+
+    def counting(keys, suffix=""):
+        calls.append(list(keys))
+        time.sleep(delay)
+        found = get_batch(keys, suffix)
+        if hook is not None:
+            hook(len(calls))
+        return found
+
+    cm.driver.get_batch = counting
+    return calls
+
+
+def test_cold_key_is_fetched_once_by_concurrent_threads(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a: 1")
+    calls = count_batches(cm, delay=0.05)
+    start = threading.Barrier(4)
+
+    def get():
+        start.wait()
+        return cm.get("app")
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: get(), range(4)))
+    assert results == [{"a": 1}] * 4
+    assert sum(keys.count("rc:app") for keys in calls) == 1
+
+
+def test_layer_dropped_during_fetch_is_fetched_again(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a: 1")
+
+    def change(call):
+        if call == 1:
+            # слой изменился, пока первый запрос был в пути
+            cm.driver.set("rc:app", "a: 2")
+            cm._drop("rc:app")
+
+    calls = count_batches(cm, hook=change)
+    assert cm.get("app") == {"a": 2}
+    assert len(calls) == 2
+
+
+def test_config_built_during_invalidation_is_not_memoized(make_manager):
+    cm = make_manager()
+    cm.driver.set("rc:app", "a: 1")
+    layer_targets = cm._layer_targets
+
+    def invalidating(key):
+        cm._invalidate("rc:app")
+        return layer_targets(key)
+
+    cm._layer_targets = invalidating
+    assert cm.get("app") == {"a": 1}
+    assert "app" not in cm._resolved
+    cm._layer_targets = layer_targets
+    assert cm.get("app") == {"a": 1}
+    assert "app" in cm._resolved
+
+
+def test_placeholder_cycle_is_detected_in_every_thread(make_manager):
+    cm = make_manager()
+    cm.driver.set_many({"rc:a": "x: $$b.y$$", "rc:b": "y: $$a.x$$", "rc:ok": "z: 1"})
+    start = threading.Barrier(8)
+
+    def get(path):
+        start.wait()
+        with pytest.raises(PlaceholderCycleError):
+            cm.get(path)
+        # состояние сборки потока очищено после ошибки
+        assert not cm._local.resolving and not cm._local.tracking
+        return cm.get("ok")
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(get, ["a", "b"] * 4))
+    assert results == [{"z": 1}] * 8
+    assert "a" not in cm._resolved and "b" not in cm._resolved
@@ -0,0 +1,52 @@
+import pytest
+
+KEYS = ["a", "a:b", "a:b:c", "a:bc", "xa:bz", "xa:b", "z"]
+
+
+@pytest.fixture
+def cm(make_manager):
+    cm = make_manager(with_attrs=False)
+    cm.driver.set_many({f"rc:{key}": "x: 1\n" for key in KEYS})
+    cm.load_cache()
+    return cm
+
+
+def cached(cm, path):
+    return sorted(cm.keys(path, cached=True))
+
+
+def test_cached_keys_match_whole_key(cm):
+    assert cached(cm, "a:b") == ["a:b"]
+    assert cached(cm, "a:b*") == ["a:b", "a:b:c", "a:bc"]
+    assert cached(cm, "a:b?") == ["a:bc"]
+    assert cached(cm, "*a:b") == ["a:b", "xa:b"]
+    assert cached(cm, "a:*") == ["a:b", "a:b:c", "a:bc"]
+    assert cached(cm, "*") == sorted(KEYS)
+    assert cached(cm, "nope:*") == []
+    assert cached(cm, "a:x") == []
+
+
+def test_cached_keys_agree_with_storage(cm):
+    for path in ["a:b", "a:b*", "*a:b", "a:*", "*:b?"]:
+        assert cached(cm, path) == sorted(cm.keys(path)), path
+
+
+def test_get_tree_takes_whole_branches(cm):
+    assert cm.get_tree("a:b") == {"a": {"b": {"c": {}}}}
+    assert cm.get_tree("a:b?") == {"a": {"bc": {}}}
+    assert cm.get_tree("xa:*") == {"xa": {"b": {}, "bz": {}}}
+    assert cm.get_tree("*:b") == {"a": {"b": {"c": {}}}, "xa": {"b": {}}}
+    assert cm.get_tree("q") == {}
+    assert cm.get_tree("") == {
+        "a": {"b": {"c": {}}, "bc": {}},
+        "xa": {"b": {}, "bz": {}},
+        "z": {},
+    }
+
+
+def test_tree_follows_cache_changes(cm):
+    cm.set("a:b:d", "y: 1\n")
+    cm.get("a:b:d")
+    assert cached(cm, "a:b:*") == ["a:b:c", "a:b:d"]
+    cm.delete_many(["a:b:c"])
+    assert cm.get_tree("a:b") == {"a": {"b": {"d": {}}}}
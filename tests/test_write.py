@@ -0,0 +1,19 @@
+def test_set_replaces_layer_created_by_another_manager(make_manager):
+    cm = make_manager(with_attrs=True)
+    other = make_manager(with_attrs=True)
+    assert cm.get_one("app", source=True)[0] is None
+    # слой появился, пока cm помнит его отсутствующим
+    other.set("app", "x: 1")
+    assert cm.set("app", "x: 2")
+    assert len(cm.driver.keys("rc:app#*")) == 1
+    assert other.get("app") == {"x": 2}
+
+
+def test_set_many_replaces_layers_created_by_another_manager(make_manager):
+    cm = make_manager(with_attrs=True)
+    other = make_manager(with_attrs=True)
+    assert cm.get_one("app", source=True)[0] is None
+    other.set("app", "x: 1")
+    cm.set_many({"app": dict(value="x: 2", attrs=dict(rev=1, user="test"))})
+    keys = cm.driver.keys("rc:app#*")
+    assert len(keys) == 1 and "#rev=2" in keys[0]